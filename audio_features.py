@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+import importlib.util
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# ======================
+# 🎧 Local Audio Features from Preview Clips
+# ======================
+CACHE_PATH = os.path.join("data", "audio_features.db")
+SAMPLE_RATE = 22050
+N_MFCC = 13
+# tracks whose preview failed to download/decode are retried after this long
+FAILURE_RETRY_SECONDS = 24 * 60 * 60
+
+# columns produced per track (also picked up by the feature store)
+SPECTRAL_FEATURES = [
+    "audio_tempo", "audio_rms", "audio_zcr", "audio_centroid",
+    "audio_bandwidth", "audio_rolloff", "audio_flatness",
+]
+MFCC_FEATURES = [f"audio_mfcc_{i}" for i in range(N_MFCC)]
+LOCAL_AUDIO_FEATURES = SPECTRAL_FEATURES + MFCC_FEATURES
+
+
+def http_fetch(url, timeout=15):
+    """Download a preview clip."""
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return resp.read()
+
+
+class LocalPreviewFetcher:
+    """
+    Stand-in for the Spotify CDN: serves <fixtures_dir>/<last url segment>[.mp3|.wav]
+    so the pipeline can run offline against local audio files.
+    """
+
+    def __init__(self, fixtures_dir):
+        self.fixtures_dir = fixtures_dir
+
+    def __call__(self, url):
+        name = url.rstrip("/").split("/")[-1].split("?")[0]
+        for candidate in (name, name + ".mp3", name + ".wav"):
+            path = os.path.join(self.fixtures_dir, candidate)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return f.read()
+        raise FileNotFoundError(f"No fixture for {url} in {self.fixtures_dir}")
+
+
+def analysis_available():
+    """True when the optional librosa dependency is installed."""
+    return importlib.util.find_spec("librosa") is not None
+
+
+def extract_features(audio_bytes):
+    """
+    Decode one clip and compute tempo, energy, spectral and MFCC (timbre)
+    descriptors. Runs inside a worker process.
+    """
+    import librosa  # optional dependency, only needed for analysis
+
+    with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
+        f.write(audio_bytes)
+        path = f.name
+    try:
+        y, sr = librosa.load(path, sr=SAMPLE_RATE, mono=True, duration=30.0)
+    finally:
+        os.remove(path)
+    if not len(y):
+        raise ValueError("empty audio")
+
+    # one STFT shared by all spectral descriptors
+    S = np.abs(librosa.stft(y))
+    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+    # MFCCs are the DCT of the log *mel* power spectrum
+    mel = librosa.feature.melspectrogram(S=S ** 2, sr=sr)
+    mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel), sr=sr, n_mfcc=N_MFCC)
+
+    values = [
+        float(np.atleast_1d(tempo)[0]),
+        float(librosa.feature.rms(S=S).mean()),
+        float(librosa.feature.zero_crossing_rate(y).mean()),
+        float(librosa.feature.spectral_centroid(S=S, sr=sr).mean()),
+        float(librosa.feature.spectral_bandwidth(S=S, sr=sr).mean()),
+        float(librosa.feature.spectral_rolloff(S=S, sr=sr).mean()),
+        float(librosa.feature.spectral_flatness(S=S).mean()),
+    ] + mfcc.mean(axis=1).astype(float).tolist()
+    return dict(zip(LOCAL_AUDIO_FEATURES, values))
+
+
+def _analyse(item):
+    track_id, audio_bytes = item
+    try:
+        return track_id, extract_features(audio_bytes), None
+    except Exception as e:
+        return track_id, None, str(e)
+
+
+class AudioFeatureCache:
+    """
+    Analysed features by track id, so each preview is decoded only once.
+    Failures are cached too (with a timestamp), so a broken preview is not
+    downloaded again on every rerun.
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # one connection shared by every session's rerun thread
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audio_features (
+                track_id TEXT PRIMARY KEY,
+                features TEXT NOT NULL,
+                analysed_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audio_failures (
+                track_id TEXT PRIMARY KEY,
+                error TEXT NOT NULL,
+                failed_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get_many(self, track_ids):
+        track_ids = list(track_ids)
+        if not track_ids:
+            return {}
+        placeholders = ",".join("?" * len(track_ids))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT track_id, features FROM audio_features WHERE track_id IN ({placeholders})", track_ids
+            ).fetchall()
+        return {t: json.loads(f) for t, f in rows}
+
+    def recent_failures(self, track_ids, max_age=FAILURE_RETRY_SECONDS):
+        """Ids among track_ids whose last attempt failed less than max_age seconds ago."""
+        track_ids = list(track_ids)
+        if not track_ids:
+            return set()
+        placeholders = ",".join("?" * len(track_ids))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT track_id FROM audio_failures WHERE track_id IN ({placeholders}) AND failed_at > ?",
+                track_ids + [time.time() - max_age],
+            ).fetchall()
+        return {t for (t,) in rows}
+
+    def put_failures(self, errors):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO audio_failures VALUES (?, ?, ?)",
+                [(t, e, now) for t, e in errors.items()],
+            )
+
+    def put_many(self, features):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO audio_features VALUES (?, ?, ?)",
+                [(t, json.dumps(f), now) for t, f in features.items()],
+            )
+            self.conn.executemany("DELETE FROM audio_failures WHERE track_id = ?", [(t,) for t in features])
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path=CACHE_PATH):
+    """One AudioFeatureCache (and SQLite connection) per process, shared across reruns."""
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = AudioFeatureCache(path)
+        return _caches[path]
+
+
+def analyse_previews(tracks, cache=None, fetch=http_fetch, fetch_workers=8, decode_workers=None):
+    """
+    tracks: iterable of (track_id, preview_url). Cached tracks are returned
+    straight from the cache; the rest are downloaded on a thread pool and
+    decoded/analysed on a process pool. Tracks that failed recently are
+    skipped, and nothing is downloaded when librosa isn't installed.
+    Returns a DataFrame with an "id" column plus LOCAL_AUDIO_FEATURES.
+    """
+    cache = cache or get_cache()
+    tracks = {t: url for t, url in tracks if t and isinstance(url, str) and url}
+    results = cache.get_many(tracks)
+    pending = [t for t in tracks if t not in results]
+    failed_recently = cache.recent_failures(pending)
+    todo = [(t, tracks[t]) for t in pending if t not in failed_recently]
+
+    if todo and not analysis_available():
+        print(f"⚠️ librosa is not installed; skipping audio analysis for {len(todo)} previews")
+        todo = []
+
+    if todo:
+        errors = {}
+
+        def download(item):
+            track_id, url = item
+            try:
+                return track_id, fetch(url)
+            except Exception as e:
+                print(f"⚠️ Preview download failed for {track_id}: {e}")
+                errors[track_id] = f"download: {e}"
+                return track_id, None
+
+        with ThreadPoolExecutor(max_workers=fetch_workers) as pool:
+            clips = [(t, b) for t, b in pool.map(download, todo) if b]
+
+        fresh = {}
+        if clips:
+            with ProcessPoolExecutor(max_workers=decode_workers) as pool:
+                for track_id, features, error in pool.map(_analyse, clips):
+                    if error:
+                        print(f"⚠️ Audio analysis failed for {track_id}: {error}")
+                        errors[track_id] = f"analysis: {error}"
+                    else:
+                        fresh[track_id] = features
+        if fresh:
+            cache.put_many(fresh)
+            results.update(fresh)
+        if errors:
+            cache.put_failures(errors)
+        print(f"🎧 Analysed {len(fresh)} new previews, {len(errors)} failed "
+              f"({len(results)} tracks with audio features)")
+
+    return pd.DataFrame(
+        [{"id": t, **f} for t, f in results.items()], columns=["id"] + LOCAL_AUDIO_FEATURES
+    )
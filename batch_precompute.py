@@ -0,0 +1,163 @@
+import os
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import spotipy
+from spotipy.oauth2 import SpotifyOAuth
+from spotipy.cache_handler import CacheFileHandler
+from dotenv import load_dotenv
+
+from dataset import build_final_dataset
+from catalog import get_catalog
+from collab_filter import get_engine, sync_playlists
+from audio_features import analyse_previews
+from shared_catalog import get_shared_catalog
+from feature_store import build_feature_store, STORE_DIR as FEATURE_STORE_DIR
+from similarity import get_neighbour_table
+from recommenders import recommend_content_based, smart_mix
+from rec_store import RecommendationStore, STORE_PATH
+
+# ======================
+# 🌙 Nightly Batch Precomputation
+# ======================
+# Usage: python batch_precompute.py --cache-dir . --top-n 20 --workers 4
+#
+# Every spotipy token cache (".cache", ".cache-<user>") is one known user.
+# Each user is processed in a worker process; the parent writes all results
+# to the recommendation store in one transaction.
+#
+# Entries are keyed on what the app looks up: Content-Based lists for every
+# seed the seed picker offers by default, and a Smart Mix for the default
+# seed, built from the app's default widget values and the same sources as
+# the live path.
+
+# same permissions as main.py
+SCOPE = (
+    "user-library-read user-top-read user-read-private user-follow-read "
+    "playlist-modify-private playlist-modify-public"
+)
+
+# main.py's default widget values
+TIME_RANGES = ("short_term", "medium_term", "long_term")
+DEFAULT_TIME_RANGE = "short_term"
+DEFAULT_TOP_LIMIT = 20
+DEFAULT_LIKED_LIMIT = 20
+DEFAULT_ARTIST_TIME_RANGE = "short_term"
+DEFAULT_ARTIST_LIMIT = 10
+
+
+def find_token_caches(cache_dir="."):
+    """All spotipy token cache files in cache_dir."""
+    return sorted(glob.glob(os.path.join(cache_dir, ".cache*")))
+
+
+def spotify_for_cache(cache_path):
+    """Spotify client that refreshes its token from a cached login."""
+    load_dotenv()
+    auth_manager = SpotifyOAuth(
+        client_id=os.getenv("SPOTIPY_CLIENT_ID"),
+        client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
+        redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
+        scope=SCOPE,
+        cache_handler=CacheFileHandler(cache_path=cache_path),
+        open_browser=False,
+    )
+    return spotipy.Spotify(auth_manager=auth_manager)
+
+
+def _first(page, limit):
+    """The response with only its first `limit` items, like main.py's sliders."""
+    return {**page, "items": page["items"][:limit]}
+
+
+def compute_user_recs(cache_path, top_n=20):
+    """
+    Worker: fetch one user's data and compute the top-N lists the app serves.
+    Returns (user_id, [(mode, seed, recs), ...]).
+    """
+    sp = spotify_for_cache(cache_path)
+    user_id = sp.current_user()["id"]
+
+    liked_df = pd.DataFrame(_first(sp.current_user_saved_tracks(limit=50), DEFAULT_LIKED_LIMIT)["items"])
+    artist_df = pd.DataFrame(_first(
+        sp.current_user_top_artists(limit=50, time_range=DEFAULT_ARTIST_TIME_RANGE), DEFAULT_ARTIST_LIMIT
+    )["items"])
+
+    # same sources as the live path
+    catalog = get_catalog()
+    cf_engine = get_engine(user_id)
+    sync_playlists(sp, cf_engine, sp.user_playlists(user_id), catalog=catalog)
+    shared_catalog = get_shared_catalog()
+    neighbours = get_neighbour_table()
+
+    results = []
+    content_seeds = set()
+    # the default time range comes first, so a seed shared by several ranges
+    # is computed from the final_df the app shows by default
+    for time_range in sorted(TIME_RANGES, key=lambda r: r != DEFAULT_TIME_RANGE):
+        top_tracks = _first(sp.current_user_top_tracks(limit=50, time_range=time_range), DEFAULT_TOP_LIMIT)
+        track_df = pd.DataFrame(top_tracks["items"])
+        final_df = build_final_dataset(track_df, liked_df, artist_df, save_dir=None)
+        if "id" not in final_df.columns:
+            continue
+        audio_df = analyse_previews(
+            zip(final_df["id"], final_df["preview_url"]) if "preview_url" in final_df.columns else []
+        )
+        final_df = final_df.merge(audio_df, on="id", how="left")
+        kaggle_audio = shared_catalog.audio_frame(final_df["id"].dropna()) if shared_catalog else None
+        feature_store = build_feature_store(
+            final_df, store_dir=os.path.join(FEATURE_STORE_DIR, user_id), audio_df=kaggle_audio
+        )
+
+        # the seed picker offers these ids when the search box is empty
+        seeds = final_df["id"].dropna().tolist()[:DEFAULT_TOP_LIMIT]
+        for seed in seeds:
+            if seed not in content_seeds:
+                content_seeds.add(seed)
+                results.append(("content", seed, recommend_content_based(
+                    final_df, seed, limit=top_n, neighbours=neighbours, catalog=catalog, features=feature_store
+                )))
+
+        if time_range == DEFAULT_TIME_RANGE and seeds:
+            results.append(("smart_mix", seeds[0], smart_mix(
+                sp, final_df, track_df, artist_df, seed_track_id=seeds[0], limit=top_n,
+                cf=cf_engine, catalog=catalog, neighbours=neighbours, features=feature_store,
+            )))
+    return user_id, results
+
+
+def run_batch(cache_dir=".", top_n=20, workers=None, store_path=STORE_PATH):
+    caches = find_token_caches(cache_dir)
+    print(f"🌙 Precomputing recommendations for {len(caches)} users")
+
+    generated_at = time.time()
+    entries = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(compute_user_recs, path, top_n): path for path in caches}
+        for future in as_completed(futures):
+            try:
+                user_id, results = future.result()
+            except Exception as e:
+                print(f"⚠️ Batch failed for {futures[future]}: {e}")
+                continue
+            entries.extend((user_id, mode, seed, recs) for mode, seed, recs in results)
+            print(f"   • {user_id}: {len(results)} modes")
+
+    store = RecommendationStore(store_path)
+    written = store.put_many(entries, generated_at=generated_at)
+    store.close()
+    print(f"✅ Saved {written} recommendation lists → {store_path}")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute per-user recommendations.")
+    parser.add_argument("--cache-dir", default=".", help="directory holding spotipy .cache* token files")
+    parser.add_argument("--top-n", type=int, default=20, help="recommendations stored per mode")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--store", default=STORE_PATH, help="SQLite store path")
+    args = parser.parse_args()
+    run_batch(args.cache_dir, args.top_n, args.workers, args.store)
@@ -0,0 +1,442 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+
+# ======================
+# 📚 SQLite Music Catalog
+# ======================
+CATALOG_PATH = os.path.join("data", "catalog.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    album_name TEXT,
+    release_year INTEGER,
+    popularity INTEGER,
+    duration_ms INTEGER,
+    url TEXT,
+    preview_url TEXT,
+    image TEXT
+);
+CREATE TABLE IF NOT EXISTS artists (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    popularity INTEGER,
+    followers INTEGER,
+    url TEXT,
+    image TEXT
+);
+CREATE TABLE IF NOT EXISTS track_artists (
+    track_id TEXT NOT NULL REFERENCES tracks(id),
+    artist_id TEXT NOT NULL REFERENCES artists(id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (track_id, artist_id)
+);
+CREATE TABLE IF NOT EXISTS artist_genres (
+    artist_id TEXT NOT NULL REFERENCES artists(id),
+    genre TEXT NOT NULL,
+    PRIMARY KEY (artist_id, genre)
+);
+CREATE TABLE IF NOT EXISTS user_likes (
+    user_id TEXT NOT NULL,
+    track_id TEXT NOT NULL REFERENCES tracks(id),
+    added_at TEXT,
+    PRIMARY KEY (user_id, track_id)
+);
+CREATE TABLE IF NOT EXISTS user_top (
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('track', 'artist')),
+    time_range TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, kind, time_range, rank)
+);
+CREATE TABLE IF NOT EXISTS playlist_tracks (
+    playlist_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    track_id TEXT NOT NULL REFERENCES tracks(id),
+    PRIMARY KEY (playlist_id, position)
+);
+
+-- bumped by every write, so derived indexes know when to rebuild
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO catalog_version VALUES (0, 0);
+
+CREATE TABLE IF NOT EXISTS user_ingests (
+    user_id TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_track_artists_artist ON track_artists(artist_id);
+CREATE INDEX IF NOT EXISTS idx_artist_genres_genre ON artist_genres(genre);
+CREATE INDEX IF NOT EXISTS idx_user_likes_track ON user_likes(track_id);
+CREATE INDEX IF NOT EXISTS idx_user_top_item ON user_top(kind, item_id);
+CREATE INDEX IF NOT EXISTS idx_playlist_tracks_track ON playlist_tracks(track_id);
+"""
+
+
+def _image(obj):
+    images = obj.get("images") or []
+    return images[0]["url"] if images else None
+
+
+def _track_row(t):
+    album = t.get("album") or {}
+    release = album.get("release_date") or ""
+    return (
+        t["id"],
+        t.get("name"),
+        album.get("name"),
+        int(release[:4]) if release[:4].isdigit() else None,
+        t.get("popularity"),
+        t.get("duration_ms"),
+        (t.get("external_urls") or {}).get("spotify"),
+        t.get("preview_url"),
+        _image(album),
+    )
+
+
+def _artist_row(a):
+    return (
+        a["id"],
+        a.get("name"),
+        a.get("popularity"),
+        (a.get("followers") or {}).get("total"),
+        (a.get("external_urls") or {}).get("spotify"),
+        _image(a),
+    )
+
+
+def _digest(*responses):
+    data = json.dumps(responses, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class Catalog:
+    """
+    Normalized track/artist/genre/user tables in one SQLite file.
+    WAL mode lets Streamlit sessions read while a writer is ingesting;
+    every bulk write runs inside a single transaction. The connection is
+    shared by all sessions of the process (get_catalog), so each public
+    method holds the lock while it uses it.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    # --- bulk upserts ---
+    def _upsert_tracks(self, tracks):
+        tracks = [t for t in tracks if t and t.get("id")]
+        self.conn.executemany(
+            """
+            INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                name=excluded.name, album_name=excluded.album_name,
+                release_year=excluded.release_year, popularity=excluded.popularity,
+                duration_ms=excluded.duration_ms, url=excluded.url,
+                preview_url=excluded.preview_url, image=excluded.image
+            """,
+            [_track_row(t) for t in tracks],
+        )
+        # simplified artist objects on tracks have no popularity/genres
+        self._upsert_artists(a for t in tracks for a in t.get("artists", []))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO track_artists VALUES (?, ?, ?)",
+            [
+                (t["id"], a["id"], pos)
+                for t in tracks
+                for pos, a in enumerate(t.get("artists", []))
+                if a.get("id")
+            ],
+        )
+
+    def _upsert_artists(self, artists):
+        artists = [a for a in artists if a and a.get("id")]
+        self.conn.executemany(
+            """
+            INSERT INTO artists VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                name=excluded.name,
+                popularity=COALESCE(excluded.popularity, artists.popularity),
+                followers=COALESCE(excluded.followers, artists.followers),
+                url=COALESCE(excluded.url, artists.url),
+                image=COALESCE(excluded.image, artists.image)
+            """,
+            [_artist_row(a) for a in artists],
+        )
+        full = [a for a in artists if "genres" in a]
+        self.conn.executemany(
+            "DELETE FROM artist_genres WHERE artist_id = ?", [(a["id"],) for a in full]
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO artist_genres VALUES (?, ?)",
+            [(a["id"], g) for a in full for g in a["genres"]],
+        )
+
+    def _bump_version(self):
+        self.conn.execute("UPDATE catalog_version SET version = version + 1")
+
+    def upsert_tracks(self, tracks):
+        with self._lock, self.conn:
+            self._upsert_tracks(tracks)
+            self._bump_version()
+
+    def upsert_artists(self, artists):
+        with self._lock, self.conn:
+            self._upsert_artists(artists)
+            self._bump_version()
+
+    def set_playlist_tracks(self, playlist_id, items):
+        """Replace a playlist's contents (items = playlist_tracks()['items'])."""
+        tracks = [item.get("track") for item in items]
+        with self._lock, self.conn:
+            self._upsert_tracks(tracks)
+            self.conn.execute("DELETE FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,))
+            self.conn.executemany(
+                "INSERT INTO playlist_tracks VALUES (?, ?, ?)",
+                [(playlist_id, pos, t["id"]) for pos, t in enumerate(tracks) if t and t.get("id")],
+            )
+            self._bump_version()
+
+    def ingest_user(self, user_id, top_tracks=None, liked_songs=None, top_artists=None,
+                    followed_artists=None, time_range="medium_term", artist_time_range="medium_term"):
+        """
+        Store one user's Spotify responses in a single transaction.
+        Each argument is the raw API response (or None to leave it untouched).
+        Skipped when the responses are identical to the last ingest for this
+        user; returns whether anything was written.
+        """
+        digest = _digest(top_tracks, liked_songs, top_artists, followed_artists, time_range, artist_time_range)
+        with self._lock:
+            row = self.conn.execute("SELECT digest FROM user_ingests WHERE user_id = ?", (user_id,)).fetchone()
+            if row is not None and row[0] == digest:
+                return False
+            with self.conn:
+                if top_tracks is not None:
+                    items = top_tracks["items"]
+                    self._upsert_tracks(items)
+                    self._set_user_top(user_id, "track", time_range, items)
+                if liked_songs is not None:
+                    items = liked_songs["items"]
+                    self._upsert_tracks(item["track"] for item in items)
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO user_likes VALUES (?, ?, ?)",
+                        [(user_id, item["track"]["id"], item.get("added_at"))
+                         for item in items if item.get("track") and item["track"].get("id")],
+                    )
+                if top_artists is not None:
+                    items = top_artists["items"]
+                    self._upsert_artists(items)
+                    self._set_user_top(user_id, "artist", artist_time_range, items)
+                if followed_artists is not None:
+                    self._upsert_artists(followed_artists)
+                self.conn.execute("INSERT OR REPLACE INTO user_ingests VALUES (?, ?)", (user_id, digest))
+                self._bump_version()
+        return True
+
+    def _set_user_top(self, user_id, kind, time_range, items):
+        self.conn.execute(
+            "DELETE FROM user_top WHERE user_id = ? AND kind = ? AND time_range = ?",
+            (user_id, kind, time_range),
+        )
+        self.conn.executemany(
+            "INSERT INTO user_top VALUES (?, ?, ?, ?, ?)",
+            [(user_id, kind, time_range, rank, item["id"])
+             for rank, item in enumerate(items, start=1) if item and item.get("id")],
+        )
+
+    # --- indexed queries ---
+    def version(self):
+        """Counter bumped by every write; equal versions mean identical contents."""
+        with self._lock:
+            return self.conn.execute("SELECT version FROM catalog_version").fetchone()[0]
+
+    def reader(self):
+        """
+        A separate connection for full-table scans (index builds), so long
+        reads don't hold the shared connection while sessions use it.
+        """
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def tracks_by_genre(self, genre, exclude_liked_by=None, limit=50):
+        """
+        Tracks by any artist tagged with genre, most popular first, optionally
+        skipping tracks the given user has already liked.
+        Uses idx_artist_genres_genre -> idx_track_artists_artist -> tracks PK.
+        """
+        query = """
+            SELECT DISTINCT t.*
+            FROM artist_genres ag
+            JOIN track_artists ta ON ta.artist_id = ag.artist_id
+            JOIN tracks t ON t.id = ta.track_id
+            WHERE ag.genre = ?
+        """
+        params = [genre]
+        if exclude_liked_by is not None:
+            query += """
+              AND NOT EXISTS (
+                SELECT 1 FROM user_likes ul WHERE ul.user_id = ? AND ul.track_id = t.id
+              )
+            """
+            params.append(exclude_liked_by)
+        query += " ORDER BY t.popularity DESC LIMIT ?"
+        params.append(limit)
+        return self._rows(query, params)
+
+    def tracks_by_ids(self, track_ids):
+        """Track rows (with comma-joined artist names) keyed by id."""
+        track_ids = list(track_ids)
+        if not track_ids:
+            return {}
+        placeholders = ",".join("?" * len(track_ids))
+        rows = self._rows(
+            f"""
+            SELECT t.*, (
+                SELECT group_concat(name, ', ') FROM (
+                    SELECT a.name FROM track_artists ta JOIN artists a ON a.id = ta.artist_id
+                    WHERE ta.track_id = t.id ORDER BY ta.position
+                )
+            ) AS artist_names
+            FROM tracks t WHERE t.id IN ({placeholders})
+            """,
+            track_ids,
+        )
+        return {r["id"]: r for r in rows}
+
+    def tracks_by_artist(self, artist_id):
+        return self._rows(
+            "SELECT t.* FROM track_artists ta JOIN tracks t ON t.id = ta.track_id WHERE ta.artist_id = ?",
+            (artist_id,),
+        )
+
+    def genres_for_artist(self, artist_id):
+        with self._lock:
+            return [g for (g,) in self.conn.execute(
+                "SELECT genre FROM artist_genres WHERE artist_id = ?", (artist_id,)
+            )]
+
+    def user_top(self, user_id, kind, time_range="medium_term"):
+        with self._lock:
+            return [i for (i,) in self.conn.execute(
+                "SELECT item_id FROM user_top WHERE user_id = ? AND kind = ? AND time_range = ? ORDER BY rank",
+                (user_id, kind, time_range),
+            )]
+
+    def liked_track_ids(self, user_id):
+        with self._lock:
+            return {t for (t,) in self.conn.execute(
+                "SELECT track_id FROM user_likes WHERE user_id = ?", (user_id,)
+            )}
+
+    def known_track_ids(self, user_id, playlist_ids=()):
+        """
+        Every track the user already knows: liked, top tracks in any time
+        range, and tracks of the given playlists (playlists aren't stored
+        per user, so the caller passes the user's playlist ids).
+        """
+        playlist_ids = list(playlist_ids)
+        placeholders = ",".join("?" * len(playlist_ids))
+        query = """
+            SELECT track_id FROM user_likes WHERE user_id = ?
+            UNION SELECT item_id FROM user_top WHERE user_id = ? AND kind = 'track'
+        """
+        if playlist_ids:
+            query += f" UNION SELECT track_id FROM playlist_tracks WHERE playlist_id IN ({placeholders})"
+        with self._lock:
+            return {t for (t,) in self.conn.execute(query, [user_id, user_id] + playlist_ids)}
+
+    def _rows(self, query, params):
+        with self._lock:
+            cur = self.conn.execute(query, params)
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, row)) for row in cur]
+
+    def close(self):
+        self.conn.close()
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(path=CATALOG_PATH):
+    """
+    One Catalog (and SQLite connection) per process. Module state survives
+    Streamlit reruns, so the schema is set up once instead of on every rerun.
+    """
+    with _catalogs_lock:
+        if path not in _catalogs:
+            _catalogs[path] = Catalog(path)
+        return _catalogs[path]
+
+
+class CatalogIndexCache:
+    """
+    An index derived from the catalog (build(conn) -> index), kept at module
+    level across Streamlit reruns and keyed on the catalog version. When the
+    catalog changes, the index is rebuilt on a background thread while the
+    previous one keeps being served; only the very first build blocks.
+    """
+
+    def __init__(self, build, name):
+        self.build = build
+        self.name = name
+        self._entries = {}  # catalog path -> (version, index)
+        self._building = set()
+        self._lock = threading.Lock()
+        self._first_build_lock = threading.Lock()
+
+    def _build(self, catalog):
+        conn = catalog.reader()
+        try:
+            # one read transaction: the version and the tables come from the same snapshot
+            conn.execute("BEGIN")
+            (version,) = conn.execute("SELECT version FROM catalog_version").fetchone()
+            return version, self.build(conn)
+        finally:
+            conn.close()
+
+    def _rebuild(self, catalog):
+        try:
+            entry = self._build(catalog)
+            with self._lock:
+                self._entries[catalog.path] = entry
+        except Exception as e:
+            print(f"⚠️ Rebuilding the {self.name} failed: {e}")
+        finally:
+            with self._lock:
+                self._building.discard(catalog.path)
+
+    def get(self, catalog):
+        version = catalog.version()
+        with self._lock:
+            cached = self._entries.get(catalog.path)
+            if cached is not None:
+                if cached[0] != version and catalog.path not in self._building:
+                    self._building.add(catalog.path)
+                    threading.Thread(
+                        target=self._rebuild, args=(catalog,), name=f"rebuild-{self.name}", daemon=True
+                    ).start()
+                return cached[1]
+
+        # nothing to serve yet: build in the foreground, once per process
+        with self._first_build_lock:
+            with self._lock:
+                cached = self._entries.get(catalog.path)
+            if cached is None:
+                cached = self._build(catalog)
+                with self._lock:
+                    self._entries[catalog.path] = cached
+            return cached[1]
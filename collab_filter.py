@@ -0,0 +1,212 @@
+import threading
+import numpy as np
+import scipy.sparse as sparse
+
+# ======================
+# 🤝 Item-Item Collaborative Filtering
+# ======================
+# neighbours kept per track, and rows scored per sparse matrix product
+TOP_K = 50
+BLOCK_SIZE = 1024
+
+
+class ItemItemCF:
+    """
+    Track similarity from playlist co-occurrence.
+    X is a binary track x playlist matrix; similarity is cosine over its
+    rows, computed block by block and truncated to the top k per track, so
+    the full track x track matrix never exists in memory.
+    """
+
+    def __init__(self, top_k=TOP_K, block_size=BLOCK_SIZE):
+        self.top_k = top_k
+        self.block_size = block_size
+        self.track_ids = []          # row -> track id
+        self.track_row = {}          # track id -> row
+        self.membership = {}         # playlist id -> int32 array of track rows
+        self.snapshots = {}          # playlist id -> Spotify snapshot_id
+        self.neighbors = []          # row -> (int32 rows, float32 scores), best first
+        self.X = sparse.csr_matrix((0, 0), dtype=np.float32)
+
+    # --- building ---
+    def _rows_for(self, track_ids):
+        rows = []
+        for t in track_ids:
+            if t not in self.track_row:
+                self.track_row[t] = len(self.track_ids)
+                self.track_ids.append(t)
+                self.neighbors.append((np.empty(0, np.int32), np.empty(0, np.float32)))
+            rows.append(self.track_row[t])
+        return np.unique(np.asarray(rows, dtype=np.int32))
+
+    def _rebuild_matrix(self):
+        cols = list(self.membership.values())
+        n_tracks = len(self.track_ids)
+        if not cols:
+            self.X = sparse.csr_matrix((n_tracks, 0), dtype=np.float32)
+            return
+        rows = np.concatenate(cols)
+        col_idx = np.repeat(np.arange(len(cols), dtype=np.int32), [len(c) for c in cols])
+        self.X = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, col_idx)), shape=(n_tracks, len(cols))
+        )
+
+    def _normalized(self):
+        norms = np.sqrt(np.asarray(self.X.sum(axis=1)).ravel())  # binary, so sum == squared norm
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).dot(self.X).tocsr()
+
+    def _compute_rows(self, rows):
+        """Recompute the top-k neighbour lists for the given track rows."""
+        Xn = self._normalized()
+        XnT = Xn.T.tocsc()
+        k = self.top_k
+        for start in range(0, len(rows), self.block_size):
+            block = rows[start:start + self.block_size]
+            sims = (Xn[block] @ XnT).tocsr()
+            for i, row in enumerate(block):
+                lo, hi = sims.indptr[i], sims.indptr[i + 1]
+                idx = sims.indices[lo:hi]
+                vals = sims.data[lo:hi]
+                keep = idx != row
+                idx, vals = idx[keep], vals[keep]
+                if len(vals) > k:
+                    top = np.argpartition(-vals, k - 1)[:k]
+                    idx, vals = idx[top], vals[top]
+                order = np.argsort(-vals)
+                self.neighbors[row] = (idx[order].astype(np.int32), vals[order].astype(np.float32))
+
+    def _co_occurring(self, rows):
+        """rows plus every track that shares at least one playlist with them."""
+        if not len(rows) or self.X.shape[1] == 0:
+            return rows
+        X = self.X
+        if X.shape[0] < len(self.track_ids):
+            X = sparse.vstack([X, sparse.csr_matrix((len(self.track_ids) - X.shape[0], X.shape[1]))]).tocsr()
+        playlists = np.unique(X[rows].indices)
+        others = np.unique(X.tocsc()[:, playlists].indices)
+        return np.union1d(rows, others).astype(np.int32)
+
+    def fit(self, playlists):
+        """playlists: {playlist_id: [track ids]}. Full (re)build."""
+        self.membership = {pid: self._rows_for(tracks) for pid, tracks in playlists.items()}
+        self._rebuild_matrix()
+        self._compute_rows(np.arange(len(self.track_ids), dtype=np.int32))
+        return self
+
+    def update(self, playlists):
+        """
+        Incremental update. playlists: {playlist_id: [track ids] or None to drop}.
+        Only tracks whose similarities can have changed are recomputed: the
+        tracks of changed playlists and everything co-occurring with them,
+        before and after the change.
+        """
+        touched = []
+        for pid, tracks in playlists.items():
+            old = self.membership.get(pid)
+            if old is not None:
+                touched.append(old)
+            if tracks is None:
+                self.membership.pop(pid, None)
+            else:
+                rows = self._rows_for(tracks)
+                self.membership[pid] = rows
+                touched.append(rows)
+        if not touched:
+            return self
+
+        touched = np.unique(np.concatenate(touched)).astype(np.int32)
+        before = self._co_occurring(touched)
+        self._rebuild_matrix()
+        after = self._co_occurring(touched)
+        self._compute_rows(np.union1d(before, after).astype(np.int32))
+        return self
+
+    # --- lookups ---
+    def similar(self, track_id, limit=10):
+        row = self.track_row.get(track_id)
+        if row is None:
+            return []
+        idx, vals = self.neighbors[row]
+        return [(self.track_ids[i], float(v)) for i, v in zip(idx[:limit], vals[:limit])]
+
+    def recommend(self, seed_track_ids, limit=10, exclude_track_ids=()):
+        """
+        Sum the neighbour scores of all seeds. Returns [(track_id, score), ...].
+        """
+        seeds = [self.track_row[t] for t in seed_track_ids if t in self.track_row]
+        if not seeds:
+            return []
+        idx = np.concatenate([self.neighbors[r][0] for r in seeds])
+        vals = np.concatenate([self.neighbors[r][1] for r in seeds])
+        if not len(idx):
+            return []
+        cand, inverse = np.unique(idx, return_inverse=True)
+        scores = np.bincount(inverse, weights=vals).astype(np.float32)
+
+        exclude = {self.track_row[t] for t in exclude_track_ids if t in self.track_row}
+        exclude.update(seeds)
+        mask = ~np.isin(cand, np.fromiter(exclude, dtype=np.int32))
+        cand, scores = cand[mask], scores[mask]
+        if not len(cand):
+            return []
+        k = min(limit, len(cand))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self.track_ids[cand[i]], float(scores[i])) for i in best]
+
+
+# ======================
+# 🔄 Playlist Sync
+# ======================
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(user_id):
+    """Per-user CF engine kept at module level, so it survives Streamlit reruns."""
+    with _engines_lock:
+        if user_id not in _engines:
+            _engines[user_id] = ItemItemCF()
+        return _engines[user_id]
+
+
+def _all_playlist_tracks(sp, playlist_id):
+    items = []
+    page = sp.playlist_items(playlist_id, additional_types=("track",), limit=100)
+    while page:
+        items.extend(page["items"])
+        page = sp.next(page) if page.get("next") else None
+    return items
+
+
+def sync_playlists(sp, engine, playlists, catalog=None):
+    """
+    Fetch tracks only for playlists whose snapshot_id changed since the last
+    sync and feed them to engine.update(). Returns the number of playlists refreshed.
+    """
+    current = {p["id"]: p.get("snapshot_id") for p in playlists["items"]}
+    changed = {}
+    for pid, snapshot in current.items():
+        if engine.snapshots.get(pid) == snapshot and pid in engine.membership:
+            continue
+        try:
+            items = _all_playlist_tracks(sp, pid)
+        except Exception as e:
+            print(f"⚠️ Failed to fetch playlist {pid}: {e}")
+            continue
+        if catalog is not None:
+            catalog.set_playlist_tracks(pid, items)
+        changed[pid] = [item["track"]["id"] for item in items if item.get("track") and item["track"].get("id")]
+        engine.snapshots[pid] = snapshot
+
+    # playlists the user no longer has
+    for pid in list(engine.snapshots):
+        if pid not in current:
+            changed[pid] = None
+            engine.snapshots.pop(pid)
+
+    if changed:
+        engine.update(changed)
+        print(f"🤝 CF updated for {len(changed)} playlists ({len(engine.track_ids)} tracks)")
+    return len(changed)
@@ -0,0 +1,119 @@
+import os
+import pandas as pd
+from persistence import get_writer
+
+# ======================
+# Save User Data + IDs
+# ======================
+def fetch_and_save_user_data(sp, top_tracks, liked_songs, top_artists, playlists, save_dir="data"):
+    """
+    Fetches user data, saves raw datasets, and also collects Track & Artist IDs for recommendations.
+    Writes go through the background writer: unchanged datasets are skipped and
+    the rest are written off the rerun thread.
+    """
+    writer = get_writer()
+
+    # --- Convert each dataset to DataFrame ---
+    track_df = pd.DataFrame(top_tracks['items'])
+    liked_df = pd.DataFrame(liked_songs['items'])
+    artist_df = pd.DataFrame(top_artists['items'])
+    playlist_df = pd.DataFrame(playlists['items'])
+
+    # --- Save raw datasets ---
+    written = [
+        writer.save_csv(track_df, os.path.join(save_dir, "top_tracks.csv")),
+        writer.save_csv(liked_df, os.path.join(save_dir, "liked_songs.csv")),
+        writer.save_csv(artist_df, os.path.join(save_dir, "top_artists.csv")),
+        writer.save_csv(playlist_df, os.path.join(save_dir, "playlists.csv")),
+    ]
+
+    print(f"✅ Raw DataFrames queued for saving ({sum(written)} changed, {len(written) - sum(written)} unchanged)")
+    print(f"   • Top Tracks: {len(track_df)} rows")
+    print(f"   • Liked Songs: {len(liked_df)} rows")
+    print(f"   • Top Artists: {len(artist_df)} rows")
+    print(f"   • Playlists: {len(playlist_df)} rows")
+
+    # --- Collect Track IDs (from top tracks + liked songs) ---
+    track_ids = track_df["id"].dropna().tolist()
+
+    liked_ids = []
+    if "track" in liked_df.columns:
+        for _, row in liked_df.iterrows():
+            if isinstance(row["track"], dict) and row["track"].get("id"):
+                liked_ids.append(row["track"]["id"])
+
+    # sorted so the file content (and its hash) is stable between reruns
+    all_track_ids = sorted(set(track_ids + liked_ids))
+    writer.save_csv(pd.DataFrame({"track_id": all_track_ids}), os.path.join(save_dir, "track_ids.csv"))
+    print(f"🎵 {len(all_track_ids)} unique track IDs → track_ids.csv")
+
+    # --- Collect Artist IDs ---
+    artist_ids = artist_df["id"].dropna().tolist()
+    writer.save_csv(pd.DataFrame({"artist_id": artist_ids}), os.path.join(save_dir, "artist_ids.csv"))
+    print(f"👩‍🎤 {len(artist_ids)} artist IDs → artist_ids.csv")
+
+    return track_df, liked_df, artist_df, playlist_df, all_track_ids, artist_ids
+
+
+# ======================
+# 🟡 Step 2: Dataset Prep
+# ======================
+def build_final_dataset(track_df, liked_df, artist_df, save_dir="data"):
+    """
+    Build a metadata-only dataset (since audio features are blocked in dev mode).
+    Includes: track popularity, release year, artist popularity, and genres.
+    Audio descriptors are added afterwards from preview clips (audio_features.py).
+    Pass save_dir=None to skip writing final_tracks.csv (e.g. from batch workers).
+    """
+    # 🎵 Collect track IDs
+    track_ids = track_df['id'].dropna().tolist()
+
+    liked_ids = []
+    if 'track' in liked_df.columns:
+        liked_ids = liked_df['track'].dropna().apply(
+            lambda x: eval(x)['id'] if isinstance(x, str) else None
+        ).dropna().tolist()
+
+    all_track_ids = list(set(track_ids + liked_ids))
+    print(f"🎶 Total unique tracks: {len(all_track_ids)}")
+
+    # 📝 Extract release year
+    if "album.release_date" in track_df.columns:
+        track_df['release_year'] = pd.to_datetime(
+            track_df['album.release_date'], errors='coerce'
+        ).dt.year
+
+    # 🎤 First artist's name (matched on by the content recommender)
+    if "artists" in track_df.columns:
+        track_df['artist_name'] = track_df['artists'].apply(
+            lambda a: a[0].get('name') if isinstance(a, list) and a and isinstance(a[0], dict) else None
+        )
+
+    # 🎤 Merge artist popularity + genres
+    if "id" in artist_df.columns:
+        artist_meta = artist_df[['id', 'popularity', 'genres']].rename(
+            columns={'id': 'artist_id', 'popularity': 'artist_popularity'}
+        )
+
+        # Simplify artist column (some are dicts/lists)
+        def get_first_artist(artist_field):
+            if isinstance(artist_field, list) and len(artist_field) > 0:
+                return artist_field[0]['id'] if isinstance(artist_field[0], dict) else artist_field[0]
+            return None
+
+        if "artists" in track_df.columns:
+            track_df['artist_id'] = track_df['artists'].apply(get_first_artist)
+
+        # Final merge
+        final_df = track_df.merge(artist_meta, on="artist_id", how="left")
+    else:
+        final_df = track_df.copy()
+
+    # 💾 Save to CSV
+    if save_dir is not None:
+        get_writer().save_csv(final_df, os.path.join(save_dir, "final_tracks.csv"))
+
+        print(f"✅ Final dataset queued → {save_dir}/final_tracks.csv")
+        print(f"   Rows: {len(final_df)} | Columns: {len(final_df.columns)}")
+        print(final_df.head())  # quick preview
+    return final_df
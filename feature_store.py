@@ -0,0 +1,175 @@
+import os
+import json
+import zlib
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from audio_features import LOCAL_AUDIO_FEATURES
+
+# ======================
+# 🧮 Track Feature Store
+# ======================
+STORE_DIR = os.path.join("data", "feature_store")
+
+# number of hashed genre buckets in the genre embedding
+GENRE_DIMS = 16
+
+# audio feature columns from the Kaggle dataset (NaN when unavailable)
+AUDIO_FEATURES = [
+    "danceability", "energy", "key", "loudness", "mode", "speechiness",
+    "acousticness", "instrumentalness", "liveness", "valence", "tempo",
+]
+
+FEATURE_COLUMNS = (
+    ["popularity", "release_year", "artist_popularity"]
+    + [f"genre_{i}" for i in range(GENRE_DIMS)]
+    + AUDIO_FEATURES
+    + LOCAL_AUDIO_FEATURES
+)
+
+
+def _release_year(row):
+    if pd.notna(row.get("release_year")):
+        return row["release_year"]
+    album = row.get("album")
+    if isinstance(album, dict) and album.get("release_date"):
+        return float(album["release_date"][:4])
+    return np.nan
+
+
+def _genre_vector(genres):
+    """
+    Hash a list of genres into a fixed-width, L2-normalised vector.
+    crc32 is used instead of hash() so buckets are stable across processes.
+    """
+    vec = np.zeros(GENRE_DIMS, dtype=np.float32)
+    if isinstance(genres, (list, tuple, np.ndarray)):
+        for g in genres:
+            vec[zlib.crc32(str(g).encode("utf-8")) % GENRE_DIMS] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+# store_dir -> (content digest, open FeatureStore), shared across reruns
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def build_feature_store(final_df, store_dir=STORE_DIR, audio_df=None):
+    """
+    Write numeric track features as a contiguous float32 matrix + id list.
+    audio_df (optional) is the Kaggle audio-features frame keyed on track_id;
+    locally analysed preview features are taken from final_df's audio_* columns.
+    The files are only rewritten when their content hash changes.
+    Returns an opened FeatureStore.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    df = final_df.dropna(subset=["id"]).drop_duplicates(subset="id")
+    if audio_df is not None:
+        audio = audio_df.rename(columns={"track_id": "id"})
+        audio_cols = ["id"] + [c for c in AUDIO_FEATURES if c in audio.columns]
+        df = df.drop(columns=[c for c in AUDIO_FEATURES if c in df.columns])
+        df = df.merge(audio[audio_cols].drop_duplicates(subset="id"), on="id", how="left")
+
+    n = len(df)
+    matrix = np.full((n, len(FEATURE_COLUMNS)), np.nan, dtype=np.float32)
+
+    for col in ("popularity", "artist_popularity"):
+        if col in df.columns:
+            matrix[:, FEATURE_COLUMNS.index(col)] = pd.to_numeric(df[col], errors="coerce")
+
+    matrix[:, FEATURE_COLUMNS.index("release_year")] = [
+        _release_year(row) for row in df.to_dict("records")
+    ]
+
+    genre_start = FEATURE_COLUMNS.index("genre_0")
+    genres = df["genres"] if "genres" in df.columns else [None] * n
+    for i, g in enumerate(genres):
+        matrix[i, genre_start:genre_start + GENRE_DIMS] = _genre_vector(g)
+
+    for col in AUDIO_FEATURES + LOCAL_AUDIO_FEATURES:
+        if col in df.columns:
+            # key/mode arrive as categoricals from the Kaggle loader
+            matrix[:, FEATURE_COLUMNS.index(col)] = pd.to_numeric(df[col].astype(object), errors="coerce")
+
+    ids = np.asarray(df["id"].astype(str).tolist(), dtype="U")
+    matrix = np.ascontiguousarray(matrix)
+
+    # unchanged content: reuse the open store instead of rewriting the files
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (json.dumps(FEATURE_COLUMNS).encode("utf-8"), ids.tobytes(), matrix.tobytes()):
+        digest.update(part)
+    digest = digest.hexdigest()
+    digest_path = os.path.join(store_dir, "digest.txt")
+    with _stores_lock:
+        cached = _stores.get(store_dir)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        if os.path.exists(digest_path):
+            with open(digest_path) as f:
+                if f.read() == digest:
+                    _stores[store_dir] = (digest, FeatureStore(store_dir))
+                    return _stores[store_dir][1]
+
+        # write to temp files and swap in, so processes that still map the
+        # old files keep reading a consistent snapshot
+        for name, arr in (("features.npy", matrix), ("ids.npy", ids)):
+            tmp = os.path.join(store_dir, name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, os.path.join(store_dir, name))
+
+        with open(os.path.join(store_dir, "columns.json"), "w") as f:
+            json.dump(FEATURE_COLUMNS, f)
+        # written last: a digest on disk means the files above are complete
+        with open(digest_path, "w") as f:
+            f.write(digest)
+
+        print(f"🧮 Feature store saved → {store_dir} ({n} tracks × {len(FEATURE_COLUMNS)} features)")
+        _stores[store_dir] = (digest, FeatureStore(store_dir))
+        return _stores[store_dir][1]
+
+
+class FeatureStore:
+    """
+    Read-only, memory-mapped view of the feature matrix.
+    The OS page cache is shared, so every process opening the same store
+    reads the same physical pages.
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self.matrix = np.load(os.path.join(store_dir, "features.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(store_dir, "ids.npy"), mmap_mode="r")
+        with open(os.path.join(store_dir, "columns.json")) as f:
+            self.columns = json.load(f)
+        # track id -> row
+        self.index = {str(tid): row for row, tid in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, track_id):
+        return track_id in self.index
+
+    def rows(self, track_ids):
+        """Row numbers for the given ids; unknown ids are dropped."""
+        index = self.index
+        return np.fromiter(
+            (index[t] for t in track_ids if t in index), dtype=np.int64
+        )
+
+    def lookup(self, track_ids, columns=None):
+        """
+        Features for a set of ids as one fancy-indexing read.
+        Returns (found_ids, matrix) since unknown ids are skipped.
+        """
+        rows = self.rows(track_ids)
+        if columns is None:
+            block = self.matrix[rows]
+        else:
+            cols = [self.columns.index(c) for c in columns]
+            block = self.matrix[np.ix_(rows, cols)]
+        return self.ids[rows].tolist(), block
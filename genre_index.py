@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+from catalog import CatalogIndexCache
+
+# ======================
+# 🏷️ Inverted Genre Index
+# ======================
+# weights of each taste signal when building the user's genre vector
+TOP_ARTIST_WEIGHT = 3.0
+LIKED_ARTIST_WEIGHT = 2.0
+FOLLOWED_ARTIST_WEIGHT = 1.0
+# relative weight of each top-artist horizon when all of them are used
+TIME_RANGE_WEIGHTS = {"short_term": 1.0, "medium_term": 1.0, "long_term": 0.5}
+
+
+def _inverted(keys, values, n_keys):
+    """
+    CSR-style inverted lists: values[offsets[k]:offsets[k + 1]] is the sorted
+    int32 array of values for key k.
+    """
+    order = np.lexsort((values, keys))
+    counts = np.bincount(keys, minlength=n_keys)
+    offsets = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, values[order].astype(np.int32)
+
+
+class GenreIndex:
+    """
+    genre -> artist ids -> track ids, all stored as sorted int32 arrays.
+    Ids are dense integer codes; track_ids / artist_ids / genres map them back.
+    """
+
+    def __init__(self, track_artist_pairs, artist_genre_pairs):
+        ta = pd.DataFrame(track_artist_pairs, columns=["track_id", "artist_id"]).drop_duplicates()
+        ag = pd.DataFrame(artist_genre_pairs, columns=["artist_id", "genre"]).drop_duplicates()
+
+        artist_codes, self.artist_ids = pd.factorize(pd.concat([ta["artist_id"], ag["artist_id"]]))
+        track_codes, self.track_ids = pd.factorize(ta["track_id"])
+        genre_codes, self.genres = pd.factorize(ag["genre"])
+        ta_artist = artist_codes[:len(ta)]
+        ag_artist = artist_codes[len(ta):]
+
+        self.track_code = {t: i for i, t in enumerate(self.track_ids)}
+        self.artist_code = {a: i for i, a in enumerate(self.artist_ids)}
+        self.genre_code = {g: i for i, g in enumerate(self.genres)}
+
+        n_tracks, n_artists, n_genres = len(self.track_ids), len(self.artist_ids), len(self.genres)
+
+        # inverted lists
+        self.genre_artists = _inverted(genre_codes, ag_artist, n_genres)
+        self.artist_tracks = _inverted(ta_artist, track_codes, n_artists)
+        self.artist_genres = _inverted(ag_artist, genre_codes, n_artists)
+
+        # track x genre weights (via the track's artists), L2-normalised per track
+        track_artist = sparse.csr_matrix(
+            (np.ones(len(ta), dtype=np.float32), (track_codes, ta_artist)), shape=(n_tracks, n_artists)
+        )
+        artist_genre = sparse.csr_matrix(
+            (np.ones(len(ag), dtype=np.float32), (ag_artist, genre_codes)), shape=(n_artists, n_genres)
+        )
+        track_genre = (track_artist @ artist_genre).tocsr()
+        norms = np.sqrt(np.asarray(track_genre.multiply(track_genre).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        self.track_genre = sparse.diags(1.0 / norms).dot(track_genre).tocsr().astype(np.float32)
+
+        # genre -> track ids: CSC column indices are already sorted per genre
+        genre_track = self.track_genre.tocsc()
+        genre_track.sort_indices()
+        self.genre_tracks = (genre_track.indptr, genre_track.indices.astype(np.int32))
+
+    @classmethod
+    def from_connection(cls, conn):
+        """Build from the catalog's track_artists and artist_genres tables."""
+        return cls(
+            conn.execute("SELECT track_id, artist_id FROM track_artists").fetchall(),
+            conn.execute("SELECT artist_id, genre FROM artist_genres").fetchall(),
+        )
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        conn = catalog.reader()
+        try:
+            return cls.from_connection(conn)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _get(inverted, key):
+        offsets, values = inverted
+        return values[offsets[key]:offsets[key + 1]]
+
+    def artists_for_genre(self, genre):
+        code = self.genre_code.get(genre)
+        return np.empty(0, np.int32) if code is None else self._get(self.genre_artists, code)
+
+    def tracks_for_genre(self, genre):
+        code = self.genre_code.get(genre)
+        return np.empty(0, np.int32) if code is None else self._get(self.genre_tracks, code)
+
+    def tracks_for_genres(self, genres, match="any"):
+        """Union ("any") or intersection ("all") of the genres' track arrays."""
+        arrays = [self.tracks_for_genre(g) for g in genres]
+        if not arrays:
+            return np.empty(0, np.int32)
+        if match == "all":
+            result = arrays[0]
+            for arr in arrays[1:]:
+                result = np.intersect1d(result, arr, assume_unique=True)
+            return result
+        return np.unique(np.concatenate(arrays))
+
+    def taste_vector(self, top_artist_ids=(), liked_artist_ids=(), followed_artist_ids=(),
+                     top_artists_by_range=None):
+        """
+        Weighted genre vector of the user. Top artists decay with rank so the
+        #1 artist counts more than the #50. top_artists_by_range
+        ({time_range: [artist ids]}) replaces top_artist_ids: ranks decay
+        within each horizon, and the horizons split TOP_ARTIST_WEIGHT by
+        TIME_RANGE_WEIGHTS.
+        """
+        vec = np.zeros(len(self.genres), dtype=np.float32)
+        if top_artists_by_range is None:
+            top_signals = [(top_artist_ids, TOP_ARTIST_WEIGHT, True)]
+        else:
+            total = sum(TIME_RANGE_WEIGHTS.get(r, 1.0) for r in top_artists_by_range) or 1.0
+            top_signals = [
+                (ids, TOP_ARTIST_WEIGHT * TIME_RANGE_WEIGHTS.get(r, 1.0) / total, True)
+                for r, ids in top_artists_by_range.items()
+            ]
+        signals = top_signals + [
+            (liked_artist_ids, LIKED_ARTIST_WEIGHT, False),
+            (followed_artist_ids, FOLLOWED_ARTIST_WEIGHT, False),
+        ]
+        for artist_ids, weight, ranked in signals:
+            for rank, artist_id in enumerate(artist_ids):
+                code = self.artist_code.get(artist_id)
+                if code is None:
+                    continue
+                w = weight / (1.0 + 0.1 * rank) if ranked else weight
+                vec[self._get(self.artist_genres, code)] += w
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def recommend(self, taste, exclude_track_ids=(), limit=10, top_genres=10):
+        """
+        Score tracks of the user's strongest genres against the taste vector.
+        Returns [(track_id, score), ...] best first.
+        """
+        if not taste.any():
+            return []
+        strongest = np.argsort(taste)[::-1][:top_genres]
+        strongest = strongest[taste[strongest] > 0]
+        candidates = np.unique(np.concatenate([self._get(self.genre_tracks, g) for g in strongest]))
+
+        exclude = np.fromiter(
+            (self.track_code[t] for t in exclude_track_ids if t in self.track_code), dtype=np.int32
+        )
+        if len(exclude):
+            candidates = np.setdiff1d(candidates, np.unique(exclude), assume_unique=True)
+        if not len(candidates):
+            return []
+
+        scores = self.track_genre[candidates] @ taste
+        k = min(limit, len(candidates))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self.track_ids[candidates[i]], float(scores[i])) for i in best]
+
+
+_cache = CatalogIndexCache(GenreIndex.from_connection, name="genre index")
+
+
+def get_index(catalog):
+    """
+    Genre index for the catalog, cached per process and rebuilt in the
+    background when the catalog changes, so a request never pays for the
+    full-table build.
+    """
+    return _cache.get(catalog)
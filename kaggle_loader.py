@@ -0,0 +1,159 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# ======================
+# 📦 Kaggle Audio-Features Loader
+# ======================
+KAGGLE_DIR = os.path.join("data", "kaggle")
+KAGGLE_CSV = os.path.join(KAGGLE_DIR, "dataset.csv")
+COMPACT_PATH = os.path.join(KAGGLE_DIR, "tracks.parquet")
+
+CHUNK_SIZE = 50_000
+# memory budget for the loaded frame, override with KAGGLE_MEMORY_BUDGET_MB
+MEMORY_BUDGET_MB = int(os.getenv("KAGGLE_MEMORY_BUDGET_MB", "512"))
+
+# parse straight into compact dtypes instead of float64/int64/object
+FLOAT_COLUMNS = [
+    "danceability", "energy", "loudness", "speechiness", "acousticness",
+    "instrumentalness", "liveness", "valence", "tempo",
+]
+READ_DTYPES = {
+    **{c: np.float32 for c in FLOAT_COLUMNS},
+    "popularity": np.int8,
+    "duration_ms": np.int32,
+    "time_signature": np.int8,
+    "key": np.int8,
+    "mode": np.int8,
+    "explicit": "boolean",
+}
+CATEGORY_COLUMNS = ["track_genre", "key", "mode"]
+# repeated strings share one object per distinct value
+INTERN_COLUMNS = ["track_id", "artists", "album_name"]
+DROP_COLUMNS = ["Unnamed: 0"]
+
+
+def _intern(series):
+    if series.dtype != object:
+        # Arrow-backed strings (pandas 3) live in their own buffers, not Python objects
+        return series
+    return series.map(lambda v: sys.intern(v) if isinstance(v, str) else v)
+
+
+def _compact_chunk(chunk):
+    chunk = chunk.drop(columns=[c for c in DROP_COLUMNS if c in chunk.columns])
+    for col in chunk.columns:
+        if col in CATEGORY_COLUMNS:
+            chunk[col] = chunk[col].astype("category")
+        elif col in INTERN_COLUMNS:
+            chunk[col] = _intern(chunk[col])
+        elif col not in READ_DTYPES and pd.api.types.is_float_dtype(chunk[col]):
+            chunk[col] = pd.to_numeric(chunk[col], downcast="float")
+        elif col not in READ_DTYPES and pd.api.types.is_integer_dtype(chunk[col]):
+            chunk[col] = pd.to_numeric(chunk[col], downcast="integer")
+    return chunk
+
+
+def _memory_bytes(chunk, seen):
+    """
+    Bytes a chunk adds to the loaded frame. Interned object columns count
+    their pointers plus the payload of every string not seen before
+    (interned strings are shared between rows and chunks, so each distinct
+    value is counted once); every other column is counted deep, which
+    includes the payload of non-interned strings and Arrow string buffers.
+    """
+    used = 0
+    for col in chunk.columns:
+        series = chunk[col]
+        if col in INTERN_COLUMNS and series.dtype == object:
+            used += series.memory_usage(index=False, deep=False)
+            for value in series.unique():
+                if isinstance(value, str) and value not in seen:
+                    seen.add(value)
+                    used += sys.getsizeof(value)
+        else:
+            used += series.memory_usage(index=False, deep=True)
+    return used
+
+
+def _concat(chunks):
+    """Concatenate chunks, merging per-chunk categories instead of falling back to object."""
+    cats = {c: union_categoricals([ch[c] for ch in chunks], sort_categories=True)
+            for c in CATEGORY_COLUMNS if c in chunks[0].columns}
+    df = pd.concat([ch.drop(columns=list(cats)) for ch in chunks], ignore_index=True)
+    for col, values in cats.items():
+        df[col] = pd.Categorical(values)
+    return df[chunks[0].columns]
+
+
+def stream_kaggle_csv(csv_path=KAGGLE_CSV, chunksize=CHUNK_SIZE, memory_budget_mb=MEMORY_BUDGET_MB):
+    """
+    Read the Kaggle CSV in chunks with compact dtypes.
+    Raises MemoryError as soon as the accumulated frame exceeds the budget.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    dtypes = {c: t for c, t in READ_DTYPES.items() if c in header}
+    budget = memory_budget_mb * 1024 * 1024
+
+    chunks = []
+    used = 0
+    seen_strings = set()
+    for chunk in pd.read_csv(csv_path, dtype=dtypes, chunksize=chunksize):
+        chunk = _compact_chunk(chunk)
+        used += _memory_bytes(chunk, seen_strings)
+        if used > budget:
+            raise MemoryError(
+                f"Kaggle dataset exceeds the {memory_budget_mb} MB budget after {sum(map(len, chunks)) + len(chunk)} rows"
+            )
+        chunks.append(chunk)
+
+    if not chunks:
+        return pd.DataFrame(columns=header)
+    return _concat(chunks)
+
+
+def _write_compact(df, compact_path):
+    os.makedirs(os.path.dirname(compact_path) or ".", exist_ok=True)
+    tmp = compact_path + ".tmp"
+    try:
+        df.to_parquet(tmp, index=False)
+    except ImportError:
+        # no parquet engine installed: pickle keeps dtypes/categories too
+        df.to_pickle(tmp)
+    os.replace(tmp, compact_path)
+
+
+def _read_compact(compact_path):
+    try:
+        df = pd.read_parquet(compact_path)
+    except (ImportError, ValueError, OSError):
+        df = pd.read_pickle(compact_path)
+    # parquet may hand integer categories (key, mode) back as plain int8
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def kaggle_available(csv_path=KAGGLE_CSV, compact_path=COMPACT_PATH):
+    return os.path.exists(compact_path) or os.path.exists(csv_path)
+
+
+def load_kaggle_tracks(csv_path=KAGGLE_CSV, compact_path=COMPACT_PATH,
+                       chunksize=CHUNK_SIZE, memory_budget_mb=MEMORY_BUDGET_MB):
+    """
+    Load the Kaggle tracks. The first call streams the CSV and writes a
+    compact columnar copy; later calls reload that copy directly.
+    """
+    if os.path.exists(compact_path) and (
+        not os.path.exists(csv_path) or os.path.getmtime(compact_path) >= os.path.getmtime(csv_path)
+    ):
+        return _read_compact(compact_path)
+
+    df = stream_kaggle_csv(csv_path, chunksize=chunksize, memory_budget_mb=memory_budget_mb)
+    _write_compact(df, compact_path)
+    print(f"📦 Kaggle dataset compacted → {compact_path} ({len(df)} rows, "
+          f"{df.memory_usage(index=False).sum() / 1024 ** 2:.1f} MB)")
+    return df
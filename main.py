@@ -1,10 +1,27 @@
 import pandas as pd
 import streamlit as st
-import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 import os
 from dotenv import load_dotenv
 import random
+from spotify_client import CoalescingSpotify
+from prefetch import get_prefetcher
+from feature_store import build_feature_store, STORE_DIR as FEATURE_STORE_DIR
+from audio_features import analyse_previews
+from shared_catalog import get_shared_catalog
+from dataset import fetch_and_save_user_data, build_final_dataset
+from recommenders import recommend_content_based, recommend_by_genre, smart_mix
+from rec_store import get_store as get_rec_store
+from catalog import get_catalog
+from genre_index import get_index as get_genre_index
+from collab_filter import get_engine, sync_playlists
+from search_index import get_index as get_search_index
+from similarity import get_neighbour_table
+from profiling import profiling_requested, start_rerun_profile
+from playlist_export import start_export, export_client
+
+# ⏱️ Opt-in per-rerun profiling (PROFILE_RERUNS=1 or ?profile=1)
+prof = start_rerun_profile(profiling_requested(st.query_params))
 
 #title 
 st.title("🎵 Spotify Music Recommender")
@@ -21,7 +38,10 @@ REDIRECT_URI = os.getenv("SPOTIPY_REDIRECT_URI")
 
 
 #set the permissions
-SCOPE = "user-library-read user-top-read user-read-private user-follow-read"
+SCOPE = (
+    "user-library-read user-top-read user-read-private user-follow-read "
+    "playlist-modify-private playlist-modify-public"
+)
 
 # Create a SpotifyOAuth object using client credentials and desired scopes.
 # This will handle login, token exchange, and redirect handling.    
@@ -32,6 +52,9 @@ auth_manager = SpotifyOAuth(
     scope=SCOPE
 )                                         
 
+# one client per rerun: identical API calls within this rerun share one request
+sp = CoalescingSpotify(auth_manager=auth_manager)
+
 #generate spotify login url 
 auth_url = auth_manager.get_authorize_url()
 
@@ -42,17 +65,16 @@ if st.button("🔐 Connect with Spotify"):
 #ask user to paste the redirect url 
 redirect_response = st.text_input("📥 Paste the full redirect url after login:")
 
+prof.stage("login")
 #process it and get the access token
 if st.button("Submit URL") and redirect_response:
     code = auth_manager.parse_response_code(redirect_response)
     token_info = auth_manager.get_access_token(code, as_dict=True)
 
     if token_info:
-        access_token = token_info['access_token']
+        # the token is now in auth_manager's cache, so the shared client can use it
         st.success("✅ Logged in successfully!")
 
-        sp = spotipy.Spotify(auth=access_token)
-
         user_profile = sp.current_user()
         st.image(user_profile['images'][0]['url'], width=100)
         st.write(f"**Welcome, {user_profile['display_name']}!** 👋")
@@ -60,9 +82,15 @@ if st.button("Submit URL") and redirect_response:
     else:
         st.error("❌ Error logging in.")
     
+prof.stage("top_prefetch")
+
 #section: top tracks after login
 st.subheader("🎵 Your Top Tracks")
-sp = spotipy.Spotify(auth_manager=auth_manager)
+
+# ⚡ all time ranges of top tracks + top artists load concurrently in the
+# background and stay in the session cache
+top_prefetch = get_prefetcher(st.session_state, sp)
+prof.stage("top_tracks")
 #dropdown to select time range
 st.markdown(
     """
@@ -81,9 +109,9 @@ time_range = st.selectbox("Choose time range:",
                           }[x]
     )
 
-# Fetch total top tracks (just to count them)
-top_tracks_data = sp.current_user_top_tracks(limit=1, time_range=time_range)
-total_top_tracks = top_tracks_data['total']
+# One full prefetched page; the total comes from its metadata (no limit=1 probe)
+top_tracks_page = top_prefetch.top_tracks(time_range)
+total_top_tracks = top_tracks_page['total']
 
 # Styled total count box
 st.markdown(
@@ -104,8 +132,7 @@ st.markdown(
 
 #fetch user's top tracks based on selected time range
 top_limit = st.slider("How many top tracks do you want to see?", min_value=5, max_value=50, value=20)
-#sp = spotipy.Spotify(auth_manager=auth_manager)
-top_tracks = sp.current_user_top_tracks(time_range=time_range, limit=top_limit)
+top_tracks = {**top_tracks_page, "items": top_tracks_page['items'][:top_limit]}
 
 #display top tracks
 st.subheader("🎵 Your Top Tracks")
@@ -125,12 +152,14 @@ for idx, item in enumerate(top_tracks['items'], start=1):
         # Bold number + clickable song name, normal artist name
         st.markdown(f"**{idx}.** [{track_name}]({track_url}) by {artist_name}")
 
+prof.stage("liked_songs")
+
 #display liked songs
 st.subheader("❤️ Your Liked Songs")
 
-#fetch all liked songs first to get the total count 
-liked_total_data = sp.current_user_saved_tracks(limit=1)
-total_liked = liked_total_data['total']
+#fetch the largest page of liked songs once; the total comes from its metadata
+liked_page = sp.current_user_saved_tracks(limit=50)
+total_liked = liked_page['total']
 
 #show total liked songs
 # Styled total liked songs box
@@ -153,7 +182,7 @@ st.markdown(
 #slider to select number of liked songs to display
 liked_limit =  st.slider("How many Liked songs do you want to see?", min_value=5, max_value=total_liked, value=20)
 #fetch liked songs from spotify 
-liked_songs = sp.current_user_saved_tracks(limit=liked_limit) #you can increase your limits
+liked_songs = {**liked_page, "items": liked_page['items'][:liked_limit]}  # served from the page above
 
 for idx, item in enumerate(liked_songs['items'], start=1):
     track = item['track']
@@ -171,6 +200,8 @@ for idx, item in enumerate(liked_songs['items'], start=1):
         # Bold number + clickable song name, normal artist name
         st.markdown(f"**{idx}.** [{track_name}]({track_url}) by {artist_name}")
 
+prof.stage("playlists")
+
 # ==========================
 # 🎵 USER PLAYLISTS SECTION
 # ==========================
@@ -221,6 +252,8 @@ for idx, playlist in enumerate(playlists['items'][:playlist_limit],start=1):
     with col2:
         st.markdown(f"**{idx}.**[{playlist_name}]({playlist_url}) — {playlist_tracks} tracks")
 
+prof.stage("top_artists")
+
 # ========================
 # 🎤 Display Top Artists
 # ========================
@@ -239,11 +272,9 @@ artist_time_range = st.selectbox(
 # Slider for how many to display
 artist_limit = st.slider("How many top artists do you want to see?", min_value=5, max_value=50, value=10)
 
-#fetch the artists
-#top_artists = sp.current_user_top_artists(limit=20, time_range=artist_time_range)
-
-# Fetch top artists from Spotify
-top_artists = sp.current_user_top_artists(limit=artist_limit, time_range=artist_time_range)
+# Top artists come from the prefetched page for this time range
+top_artists_page = top_prefetch.top_artists(artist_time_range)
+top_artists = {**top_artists_page, "items": top_artists_page["items"][:artist_limit]}
 # Styled total count box
 st.markdown(
     f"""
@@ -275,6 +306,8 @@ for idx, artist in enumerate(top_artists["items"], start=1):
     with col2:
         st.markdown(f"**{idx}.**[{artist_name}]({artist_url})")
 
+prof.stage("saved_artists")
+
 # ======================
 # 🎤 Your Saved Artists
 # ======================
@@ -321,307 +354,150 @@ for idx, artist in enumerate(saved_artists[:saved_limit], start=1):
         st.markdown(f"**{idx}.**[{artist_name}]({artist_url})")
 
 # ======================
-# Save User Data + IDs
+# 💾 Save User Data + Dataset Prep
 # ======================
-def fetch_and_save_user_data(sp, top_tracks, liked_songs, top_artists, playlists, save_dir="data"):
-    """
-    Fetches user data, saves raw datasets, and also collects Track & Artist IDs for recommendations.
-    """
-
-    # prepare a folder for saving
-    os.makedirs(save_dir, exist_ok=True)
-
-    # --- Convert each dataset to DataFrame ---
-    track_df = pd.DataFrame(top_tracks['items'])
-    liked_df = pd.DataFrame(liked_songs['items'])
-    artist_df = pd.DataFrame(top_artists['items'])
-    playlist_df = pd.DataFrame(playlists['items'])
-
-    # --- Save raw datasets ---
-    track_df.to_csv(os.path.join(save_dir, "top_tracks.csv"), index=False)
-    liked_df.to_csv(os.path.join(save_dir, "liked_songs.csv"), index=False)
-    artist_df.to_csv(os.path.join(save_dir, "top_artists.csv"), index=False)
-    playlist_df.to_csv(os.path.join(save_dir, "playlists.csv"), index=False)
-
-    print("✅ Raw DataFrames saved to CSV")
-    print(f"   • Top Tracks: {len(track_df)} rows")
-    print(f"   • Liked Songs: {len(liked_df)} rows")
-    print(f"   • Top Artists: {len(artist_df)} rows")
-    print(f"   • Playlists: {len(playlist_df)} rows")
-
-    # --- Collect Track IDs (from top tracks + liked songs) ---
-    track_ids = track_df["id"].dropna().tolist()
-
-    liked_ids = []
-    if "track" in liked_df.columns:
-        for _, row in liked_df.iterrows():
-            if isinstance(row["track"], dict) and row["track"].get("id"):
-                liked_ids.append(row["track"]["id"])
-
-    all_track_ids = list(set(track_ids + liked_ids))
-    pd.DataFrame({"track_id": all_track_ids}).to_csv(
-        os.path.join(save_dir, "track_ids.csv"), index=False
-    )
-    print(f"🎵 Saved {len(all_track_ids)} unique track IDs → track_ids.csv")
-
-    # --- Collect Artist IDs ---
-    artist_ids = artist_df["id"].dropna().tolist()
-    pd.DataFrame({"artist_id": artist_ids}).to_csv(
-        os.path.join(save_dir, "artist_ids.csv"), index=False
-    )
-    print(f"👩‍🎤 Saved {len(artist_ids)} artist IDs → artist_ids.csv")
-
-    return track_df, liked_df, artist_df, playlist_df, all_track_ids, artist_ids
-
+prof.stage("save_user_data")
 track_df, liked_df, artist_df, playlist_df, track_ids, artist_ids = fetch_and_save_user_data(
     sp, top_tracks, liked_songs, top_artists, playlists
 )
-
-# ======================
-# 🟡 Step 2: Dataset Prep
-# ======================
-def build_final_dataset(track_df, liked_df, artist_df):
-    """
-    Build a metadata-only dataset (since audio features are blocked in dev mode).
-    Includes: track popularity, release year, artist popularity, and genres.
-    """
-    # 🎵 Collect track IDs
-    track_ids = track_df['id'].dropna().tolist()
-
-    liked_ids = []
-    if 'track' in liked_df.columns:
-        liked_ids = liked_df['track'].dropna().apply(
-            lambda x: eval(x)['id'] if isinstance(x, str) else None
-        ).dropna().tolist()
-
-    all_track_ids = list(set(track_ids + liked_ids))
-    print(f"🎶 Total unique tracks: {len(all_track_ids)}")
-
-    # 📝 Extract release year
-    if "album.release_date" in track_df.columns:
-        track_df['release_year'] = pd.to_datetime(
-            track_df['album.release_date'], errors='coerce'
-        ).dt.year
-
-    # 🎤 Merge artist popularity + genres
-    if "id" in artist_df.columns:
-        artist_meta = artist_df[['id', 'popularity', 'genres']].rename(
-            columns={'id': 'artist_id', 'popularity': 'artist_popularity'}
-        )
-
-        # Simplify artist column (some are dicts/lists)
-        def get_first_artist(artist_field):
-            if isinstance(artist_field, list) and len(artist_field) > 0:
-                return artist_field[0]['id'] if isinstance(artist_field[0], dict) else artist_field[0]
-            return None
-
-        if "artists" in track_df.columns:
-            track_df['artist_id'] = track_df['artists'].apply(get_first_artist)
-
-        # Final merge
-        final_df = track_df.merge(artist_meta, on="artist_id", how="left")
-    else:
-        final_df = track_df.copy()
-
-    # 💾 Save to CSV
-    if not os.path.exists("data"):
-        os.makedirs("data")
-    final_df.to_csv("data/final_tracks.csv", index=False)
-
-    print("✅ Final dataset saved → data/final_tracks.csv")
-    print(f"   Rows: {len(final_df)} | Columns: {len(final_df.columns)}")
-    print(final_df.head())  # quick preview
-    return final_df
-
+prof.stage("build_final_dataset")
 final_df = build_final_dataset(track_df, liked_df, artist_df)
 
-# ======================
-# 👩‍🎤 Recommend by Similar Artists
-# ======================
-def recommend_by_artists(sp, artist_df, limit=10):
-    """
-    Recommend tracks based on related artists.
-    Returns a list of dicts with track info for UI display.
-    """
-    recs = []
-    for artist_id in artist_df["id"].dropna().unique()[:5]:
-        try:
-            related = sp.artist_related_artists(artist_id)
-            for ra in related["artists"][:2]:
-                top_tracks = sp.artist_top_tracks(ra["id"])
-                for t in top_tracks["tracks"][:2]:
-                    recs.append({
-                        "id": t["id"],
-                        "name": t["name"],
-                        "artist": ", ".join([a["name"] for a in t["artists"]]),
-                        "url": t["external_urls"]["spotify"],
-                        "preview": t.get("preview_url"),
-                        "image": t["album"]["images"][0]["url"] if t["album"]["images"] else None
-                    })
-                    if len(recs) >= limit:
-                        return recs
-        except Exception as e:
-            print(f"⚠️ Failed artist rec for {artist_id}: {e}")
-    return recs[:limit]
-
-
-# ======================
-# 🎵 Spotify Recommendations API
-# ======================
-def recommend_spotify(sp, track_df, artist_df, limit=10):
-    """
-    Recommend tracks using Spotify's recommendations API.
-    Returns a list of dicts with track info for UI display.
-    """
-    seed_artists = artist_df["id"].dropna().tolist()[:2]
-    seed_tracks = track_df["id"].dropna().tolist()[:2]
-
-    try:
-        recs = sp.recommendations(
-            seed_artists=seed_artists,
-            seed_tracks=seed_tracks,
-            limit=limit
-        )
-        results = []
-        for t in recs["tracks"]:
-            results.append({
-                "id": t["id"],
-                "name": t["name"],
-                "artist": ", ".join([a["name"] for a in t["artists"]]),
-                "url": t["external_urls"]["spotify"],
-                "preview": t.get("preview_url"),
-                "image": t["album"]["images"][0]["url"] if t["album"]["images"] else None
-            })
-        return results
-    except Exception as e:
-        print(f"⚠️ Spotify recs failed: {e}")
-        return []
-
-
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-
-# ======================
-# 🎯 Content-Based Recommender
-# ======================
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-
-def recommend_content_based(final_df, seed_track, limit=10):
-    """
-    Recommend songs similar to a seed track using cosine similarity on text features.
-    Returns a list of dicts with UI-friendly info.
-    """
-    if "name" not in final_df.columns or "artist_name" not in final_df.columns:
-        return []
-
-    # Combine track name + artist name as text
-    final_df["combined"] = final_df["name"].fillna("") + " " + final_df["artist_name"].fillna("")
-
-    # Vectorize
-    vectorizer = TfidfVectorizer(stop_words="english")
-    tfidf_matrix = vectorizer.fit_transform(final_df["combined"])
-
-    # Find the seed track index
-    try:
-        idx = final_df[final_df["name"] == seed_track].index[0]
-    except IndexError:
-        return []
-
-    cosine_sim = cosine_similarity(tfidf_matrix[idx], tfidf_matrix).flatten()
-    sim_indices = cosine_sim.argsort()[-limit-1:-1][::-1]  # exclude the seed itself
-
-    recs = []
-    for i in sim_indices:
-        row = final_df.iloc[i]
-        recs.append({
-            "id": row.get("id"),
-            "name": row.get("name"),
-            "artist": row.get("artist_name"),
-            "url": row["external_urls"]["spotify"] if isinstance(row.get("external_urls"), dict) else None,
-            "preview": row.get("preview_url"),
-            "image": row["album"]["images"][0]["url"] if isinstance(row.get("album"), dict) and row["album"].get("images") else None
-        })
-
-    return recs
-
-
-import numpy as np
-
-# ======================
-# 🌀 Smart Mix Recommender
-# ======================
-def smart_mix(sp, final_df, track_df, artist_df, seed_track=None, limit=10):
-    """
-    Hybrid recommender: combine content-based + Spotify API + similar artists.
-    Returns a list of dicts with UI-friendly info.
-    """
-    recs = []
-
-    # Content-based part
-    if seed_track:
-        cb_recs = recommend_content_based(final_df, seed_track, limit=limit//3)
-        recs.extend(cb_recs)
-
-    # Spotify picks
-    api_recs = recommend_spotify(sp, track_df, artist_df, limit=limit//3)
-    recs.extend(api_recs)
-
-    # Similar artists
-    artist_recs = recommend_by_artists(sp, artist_df, limit=limit//3)
-    recs.extend(artist_recs)
-
-    # Deduplicate by track id
-    seen = set()
-    unique_recs = []
-    for r in recs:
-        if r["id"] not in seen:
-            seen.add(r["id"])
-            unique_recs.append(r)
+# 📚 Upsert this user's data into the indexed SQLite catalog (one connection
+# per process; skipped when the responses haven't changed)
+prof.stage("catalog_ingest")
+catalog = get_catalog()
+catalog.ingest_user(
+    user_id, top_tracks=top_tracks, liked_songs=liked_songs, top_artists=top_artists,
+    followed_artists=saved_artists, time_range=time_range, artist_time_range=artist_time_range
+)
 
-    return unique_recs[:limit]
+# 🤝 Item-item CF from playlist co-occurrence (only changed playlists are re-fetched)
+prof.stage("playlist_cf_sync")
+cf_engine = get_engine(user_id)
+sync_playlists(sp, cf_engine, playlists, catalog=catalog)
 
+# 🎧 Audio features analysed locally from 30s previews (cached per track id)
+prof.stage("audio_features")
+audio_df = analyse_previews(
+    zip(final_df["id"], final_df["preview_url"]) if "preview_url" in final_df.columns else []
+)
+final_df = final_df.merge(audio_df, on="id", how="left")
+
+# 🌐 Global Kaggle catalog, memory-mapped once per process and shared by all
+# sessions; only this user's rows are read from it
+prof.stage("shared_catalog")
+shared_catalog = get_shared_catalog()
+kaggle_audio = shared_catalog.audio_frame(final_df["id"].dropna()) if shared_catalog else None
+
+# 🧮 Numeric features as a memory-mapped float32 matrix, indexed by track id
+# (rewritten only when the content changes; used by the content recommender)
+prof.stage("feature_store")
+feature_store = build_feature_store(
+    final_df, store_dir=os.path.join(FEATURE_STORE_DIR, user_id), audio_df=kaggle_audio
+)
 
 # ======================
 # 🎛 Update Streamlit UI
 # ======================
+prof.stage("recommendation_widgets")
 st.header("🎵 Recommendations")
 
+# precomputed top-N lists written by batch_precompute.py
+rec_store = get_rec_store()
+
+# precomputed top-k content neighbours written by similarity.py (shared,
+# read-only; reopened after a rebuild)
+neighbour_table = get_neighbour_table()
+
 mode = st.selectbox("Choose a recommendation mode", [
     "Content-Based (Cosine Similarity)",
+    "By Genre",
     "Smart Mix"
 ])
 num_recs = st.slider("Number of recommendations", 5, 20, 10)
 
 if mode in ["Content-Based (Cosine Similarity)", "Smart Mix"]:
-    seed_track = st.selectbox("Pick a seed track", final_df["name"].dropna().unique())
+    # type-ahead search over the catalog; the seed is an exact track id
+    search_index = get_search_index(catalog)
+    query = st.text_input("🔎 Search for a seed track (name or artist)")
+    matches = search_index.search(query, limit=20) if query else final_df["id"].dropna().tolist()[:20]
+    seed_track_id = st.selectbox("Pick a seed track", matches, format_func=search_index.label)
 else:
-    seed_track = None
+    seed_track_id = None
 
 if st.button("Get Recommendations"):
-    if mode == "Content-Based (Cosine Similarity)" and seed_track:
-        recs = recommend_content_based(final_df, seed_track, limit=num_recs)
+    prof.stage("recommend")
+    # serve from the nightly precomputed store when a fresh entry exists
+    store_mode = {"Content-Based (Cosine Similarity)": "content", "Smart Mix": "smart_mix"}.get(mode)
+    recs = rec_store.get(user_id, store_mode, seed=seed_track_id or "") if store_mode else None
+
+    if recs is not None:
+        recs = recs[:num_recs]
+
+    elif mode == "Content-Based (Cosine Similarity)" and seed_track_id:
+        recs = recommend_content_based(final_df, seed_track_id, limit=num_recs,
+                                       neighbours=neighbour_table, catalog=catalog, features=feature_store)
+
+    elif mode == "By Genre":
+        genre_index = get_genre_index(catalog)
+        # taste uses top artists from all three horizons (already prefetched);
+        # liked, top and playlist tracks the user already has are skipped
+        recs = recommend_by_genre(genre_index, catalog, top_artists, liked_songs, saved_artists, limit=num_recs,
+                                  top_artists_by_range=top_prefetch.top_artists_by_range(),
+                                  user_id=user_id, playlist_ids=[p["id"] for p in playlists["items"]])
 
     elif mode == "Smart Mix":
-        recs = smart_mix(sp, final_df, track_df, artist_df, seed_track=seed_track, limit=num_recs)
+        recs = smart_mix(sp, final_df, track_df, artist_df, seed_track_id=seed_track_id, limit=num_recs,
+                         cf=cf_engine, catalog=catalog, neighbours=neighbour_table, features=feature_store)
 
     else:
         recs = []
+    # keep the list across reruns so it can be exported below
+    st.session_state["last_recs"] = [r.id for r in recs if r.id]
+
     # --- 🎧 Display Recommendations ---
+    prof.stage("render_recommendations")
     if recs:
         st.subheader("Recommended Songs 🎶")
         for idx, rec in enumerate(recs, start=1):
             col1, col2 = st.columns([1, 3])
             with col1:
-                if rec.get("image"):
-                    st.image(rec["image"], width=80)
+                if rec.image:
+                    st.image(rec.image, width=80)
             with col2:
-                st.markdown(f"**{idx}. {rec['name']}** by {rec['artist']}")
-                if rec.get("url"):
-                    st.markdown(f"[▶️ Listen on Spotify]({rec['url']})")
-                if rec.get("preview"):
-                    st.audio(rec["preview"], format="audio/mp3")
+                st.markdown(f"**{idx}. {rec.name}** by {rec.artist}")
+                if rec.url:
+                    st.markdown(f"[▶️ Listen on Spotify]({rec.url})")
+                if rec.preview:
+                    st.audio(rec.preview, format="audio/mp3")
     else:
         st.info("No recommendations found. Try another mode.")
 
+# ======================
+# 💾 Save Recommendations to Spotify
+# ======================
+if st.session_state.get("last_recs"):
+    prof.stage("playlist_export")
+    playlist_name = st.text_input("Playlist name", value=f"{mode} picks")
+    if st.button("💾 Save as Spotify playlist"):
+        # runs on a background thread; a failed export resumes on the next click
+        st.session_state["export"] = start_export(
+            export_client(auth_manager), user_id, playlist_name, st.session_state["last_recs"],
+            description="Created by Spotify Hybrid Recommender"
+        )
+
+    export = st.session_state.get("export")
+    if export is not None:
+        if not export.done():
+            st.info("⏳ Saving playlist in the background…")
+        elif export.exception():
+            st.error(f"❌ Playlist export failed: {export.exception()} — click save again to resume.")
+        else:
+            st.success(f"✅ Playlist saved: https://open.spotify.com/playlist/{export.result()}")
+
+# ⏱️ write the profile for this rerun (no-op unless profiling is on); a rerun
+# that stops early is finished by start_rerun_profile at the next rerun
+prof.finish()
+
  
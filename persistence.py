@@ -0,0 +1,89 @@
+import os
+import queue
+import atexit
+import hashlib
+import tempfile
+import threading
+
+# ======================
+# 💾 Change-Detecting Background Writer
+# ======================
+class BackgroundWriter:
+    """
+    Writes files on a daemon thread so Streamlit reruns never wait on disk.
+    Each save is content-hashed first; if the bytes for that path are the same
+    as the last write, nothing is queued. Files are written to a temp file in
+    the same folder and renamed into place, so readers never see partial files.
+    """
+
+    def __init__(self):
+        self._hashes = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="background-writer", daemon=True)
+        self._thread.start()
+
+    def save_text(self, path, text):
+        """Queue text for path; returns False when the content is unchanged."""
+        data = text.encode("utf-8")
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with self._lock:
+            if self._hashes.get(path) == digest:
+                return False
+            self._hashes[path] = digest
+        self._queue.put((path, data))
+        return True
+
+    def save_csv(self, df, path):
+        """Serialise df now (so later mutations can't race) and queue the write."""
+        return self.save_text(path, df.to_csv(index=False))
+
+    def flush(self):
+        """Block until every queued write has hit the disk."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            path, data = self._queue.get()
+            try:
+                _atomic_write(path, data)
+            except Exception as e:
+                # forget the hash so the next save retries the write
+                with self._lock:
+                    self._hashes.pop(path, None)
+                print(f"⚠️ Background write failed for {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+def _atomic_write(path, data):
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """
+    Process-wide writer. Imported modules survive Streamlit reruns, so the
+    thread and the remembered hashes are shared by every rerun.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BackgroundWriter()
+            atexit.register(_writer.flush)
+        return _writer
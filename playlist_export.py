@@ -0,0 +1,220 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import spotipy
+from spotipy.exceptions import SpotifyException
+
+# ======================
+# 💾 Playlist Export
+# ======================
+STATE_PATH = os.path.join("data", "exports.db")
+BATCH_SIZE = 100  # Spotify's max URIs per add-items call
+MAX_RETRIES = 5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# exports run here so the Streamlit script thread never waits on them
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="playlist-export")
+# export key -> Future of the export currently running for it
+_running = {}
+_running_lock = threading.Lock()
+
+
+def export_client(auth_manager):
+    """
+    Spotify client for exports. spotipy's default session retries POSTs on
+    its own, which can duplicate a playlist or a batch; a plain session leaves
+    every retry decision to export_playlist.
+    """
+    return spotipy.Spotify(auth_manager=auth_manager, requests_session=requests.Session())
+
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before retrying after error, or None to give up."""
+    if attempt >= MAX_RETRIES:
+        return None
+    if isinstance(error, SpotifyException):
+        if error.http_status not in RETRY_STATUSES:
+            return None
+        retry_after = (error.headers or {}).get("Retry-After")
+        return float(retry_after) if retry_after else 2 ** attempt
+    if isinstance(error, requests.exceptions.RequestException):
+        return 2 ** attempt
+    return None
+
+
+def _rate_limited(error):
+    # a 429 is rejected before it is processed, so resending is always safe
+    return isinstance(error, SpotifyException) and error.http_status == 429
+
+
+def _with_retry(fn, *args, **kwargs):
+    """
+    Call fn, retrying rate limits / server errors with backoff (honours
+    Retry-After). Only for idempotent reads; writes are resent by their callers
+    after checking what already landed.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except (SpotifyException, requests.exceptions.RequestException) as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None:
+                raise
+        time.sleep(delay)
+
+
+def _recent_playlists(sp):
+    # newly created playlists are listed first
+    return _with_retry(sp.current_user_playlists, limit=50)["items"]
+
+
+def _create_playlist(sp, user_id, name, description, public):
+    """
+    Create the playlist once. A create that failed with a server or network
+    error may still have gone through, so before resending it the user's
+    playlists are checked for a new one with this name.
+    """
+    before = {p["id"] for p in _recent_playlists(sp)}
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return sp.user_playlist_create(user_id, name, public=public, description=description)["id"]
+        except (SpotifyException, requests.exceptions.RequestException) as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            if not _rate_limited(e):
+                for playlist in _recent_playlists(sp):
+                    if playlist["id"] not in before and playlist["name"] == name:
+                        return playlist["id"]
+
+
+def _playlist_total(sp, playlist_id):
+    return _with_retry(sp.playlist, playlist_id, fields="tracks.total")["tracks"]["total"]
+
+
+class ExportState:
+    """
+    Progress of each export, keyed on (user, name, exact track list), so
+    re-running the same export after a failure resumes the same playlist
+    instead of creating a duplicate.
+    """
+
+    def __init__(self, path=STATE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS exports (
+                export_key TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                playlist_id TEXT,
+                total INTEGER NOT NULL,
+                added INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def key(user_id, name, uris):
+        digest = hashlib.sha1("\n".join(uris).encode("utf-8")).hexdigest()
+        return f"{user_id}:{name}:{digest}"
+
+    def get(self, export_key):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT playlist_id, added FROM exports WHERE export_key = ?", (export_key,)
+            ).fetchone()
+        return row
+
+    def save(self, export_key, user_id, name, playlist_id, total, added):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO exports VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (export_key, user_id, name, playlist_id, total, added, time.time()),
+            )
+
+
+def _track_uris(track_ids):
+    return [f"spotify:track:{t}" for t in dict.fromkeys(track_ids) if t]
+
+
+def export_playlist(sp, user_id, name, track_ids, description="", public=False, state=None, progress=None):
+    """
+    Create a playlist and add track_ids in batches of 100 URIs per call
+    (1,000 tracks = 1 create + 10 add calls). Safe to call again after a
+    failure: the same export resumes from what the playlist already holds.
+    progress(added, total) is called after each batch. Returns the playlist id.
+    """
+    state = state or ExportState()
+    uris = _track_uris(track_ids)
+    export_key = ExportState.key(user_id, name, uris)
+
+    saved = state.get(export_key)
+    playlist_id, added = saved if saved else (None, 0)
+
+    if playlist_id is None:
+        playlist_id = _create_playlist(sp, user_id, name, description, public)
+        state.save(export_key, user_id, name, playlist_id, len(uris), 0)
+    else:
+        # the playlist itself is the source of truth: a batch may have landed
+        # right before the failure, after the last recorded progress
+        added = _playlist_total(sp, playlist_id)
+
+    attempt = 0
+    while added < len(uris):
+        batch = uris[added:added + BATCH_SIZE]
+        try:
+            sp.playlist_add_items(playlist_id, batch)
+        except (SpotifyException, requests.exceptions.RequestException) as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None:
+                raise
+            attempt += 1
+            time.sleep(delay)
+            if not _rate_limited(e):
+                # the batch may have been added before the error: resume from the playlist
+                added = _playlist_total(sp, playlist_id)
+            continue
+        attempt = 0
+        added += len(batch)
+        state.save(export_key, user_id, name, playlist_id, len(uris), added)
+        if progress:
+            progress(added, len(uris))
+
+    print(f"💾 Exported {len(uris)} tracks → playlist {playlist_id}")
+    return playlist_id
+
+
+def start_export(sp, user_id, name, track_ids, **kwargs):
+    """
+    Run export_playlist in the background; returns a Future of the playlist id.
+    While an export is running, starting the same export again returns its
+    Future instead of racing it into a second playlist.
+    """
+    track_ids = list(track_ids)
+    export_key = ExportState.key(user_id, name, _track_uris(track_ids))
+    with _running_lock:
+        future = _running.get(export_key)
+        if future is not None and not future.done():
+            return future
+        future = _executor.submit(export_playlist, sp, user_id, name, track_ids, **kwargs)
+        _running[export_key] = future
+    # outside the lock: the callback runs inline if the export already finished
+    future.add_done_callback(lambda f: _forget(export_key, f))
+    return future
+
+
+def _forget(export_key, future):
+    with _running_lock:
+        if _running.get(export_key) is future:
+            del _running[export_key]
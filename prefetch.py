@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ======================
+# ⚡ Background Prefetch of Top Tracks / Artists
+# ======================
+TIME_RANGES = ("short_term", "medium_term", "long_term")
+PAGE_LIMIT = 50
+# how long prefetched pages are reused before fetching again
+TTL_SECONDS = 10 * 60
+
+_executor = ThreadPoolExecutor(max_workers=2 * len(TIME_RANGES), thread_name_prefix="top-prefetch")
+
+
+class TopPrefetcher:
+    """
+    Loads top tracks and top artists for every time range concurrently in the
+    background. Each accessor only waits for the page it needs, so switching
+    the time-range selectbox renders without a new API call.
+    """
+
+    def __init__(self, sp):
+        self.sp = sp
+        self.created_at = time.time()
+        self.futures = {}
+        for time_range in TIME_RANGES:
+            self._submit("tracks", time_range)
+            self._submit("artists", time_range)
+
+    def _submit(self, kind, time_range):
+        fetch = self.sp.current_user_top_tracks if kind == "tracks" else self.sp.current_user_top_artists
+        self.futures[(kind, time_range)] = _executor.submit(fetch, limit=PAGE_LIMIT, time_range=time_range)
+
+    def _result(self, kind, time_range):
+        future = self.futures[(kind, time_range)]
+        try:
+            return future.result()
+        except Exception:
+            # retry on the next access instead of caching the failure
+            self._submit(kind, time_range)
+            raise
+
+    def expired(self):
+        return time.time() - self.created_at > TTL_SECONDS
+
+    def top_tracks(self, time_range):
+        return self._result("tracks", time_range)
+
+    def top_artists(self, time_range):
+        return self._result("artists", time_range)
+
+    def top_artists_by_range(self):
+        """{time_range: top artists} for every horizon, each in its own rank order."""
+        return {time_range: self.top_artists(time_range)["items"] for time_range in TIME_RANGES}
+
+
+def get_prefetcher(session_state, sp):
+    """The session's prefetcher, started on first use and refreshed after TTL_SECONDS."""
+    prefetcher = session_state.get("top_prefetch")
+    if prefetcher is None or prefetcher.expired():
+        prefetcher = TopPrefetcher(sp)
+        session_state["top_prefetch"] = prefetcher
+    return prefetcher
@@ -0,0 +1,190 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from datetime import datetime
+
+# ======================
+# ⏱️ Per-Rerun Profiling
+# ======================
+# Enable with PROFILE_RERUNS=1 or by opening the app with ?profile=1.
+# Each profiled rerun writes to profiles/<timestamp>/:
+#   rerun.prof      cProfile stats (snakeviz / flameprof / gprof2dot)
+#   stages.folded   "rerun;<stage> <ms>" lines for flamegraph.pl / speedscope
+#   stages.json     wall time + peak allocated memory per named stage
+#   allocations.txt top allocation sites from tracemalloc
+PROFILES_DIR = "profiles"
+TOP_ALLOCATIONS = 25
+
+# profiles that have started but not finished, and how many of them need tracemalloc
+_active = set()
+_active_lock = threading.Lock()
+_tracemalloc_users = 0
+_started_tracemalloc = False
+# one profiled rerun per process at a time: on Python 3.12+ cProfile.enable()
+# raises ValueError while another profiler is active
+_profiling_lock = threading.Lock()
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users, _started_tracemalloc
+    with _active_lock:
+        if _tracemalloc_users == 0:
+            _started_tracemalloc = not tracemalloc.is_tracing()
+            if _started_tracemalloc:
+                tracemalloc.start(25)
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users
+    with _active_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _started_tracemalloc:
+            tracemalloc.stop()
+
+
+def profiling_requested(query_params=None):
+    if os.getenv("PROFILE_RERUNS", "").lower() in ("1", "true", "yes"):
+        return True
+    return bool(query_params) and str(query_params.get("profile", "")).lower() in ("1", "true", "yes")
+
+
+class RerunProfile:
+    """
+    CPU profile + allocation tracking for one Streamlit rerun.
+    stage(name) closes the current stage and opens the next one, so the
+    script is split into named sections without re-indenting it.
+    """
+
+    def __init__(self, out_dir=PROFILES_DIR):
+        self.out_dir = os.path.join(out_dir, datetime.now().strftime("%Y%m%d-%H%M%S-%f"))
+        self.stages = []
+        self._current = None
+        self._thread = threading.current_thread()
+        self._released = False
+        if not _profiling_lock.acquire(blocking=False):
+            raise RuntimeError("another rerun is already being profiled")
+        # enabled before anything is registered, so a failed start leaks nothing
+        try:
+            self._profiler = cProfile.Profile()
+            self._t0 = time.perf_counter()
+            self._profiler.enable()
+        except BaseException:
+            _profiling_lock.release()
+            raise
+        _acquire_tracemalloc()
+        with _active_lock:
+            _active.add(self)
+        self.stage("startup")
+
+    def stage(self, name):
+        now = time.perf_counter()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._current is not None:
+            stage_name, started, baseline = self._current
+            self.stages.append({
+                "stage": stage_name,
+                "seconds": now - started,
+                "peak_mb": max(0, peak - baseline) / 1024 ** 2,
+            })
+        tracemalloc.reset_peak()
+        self._current = (name, now, current)
+
+    def _release(self):
+        """Turn the profiler off and give back tracemalloc; safe to call twice."""
+        if self._released:
+            return
+        self._released = True
+        self._profiler.disable()
+        with _active_lock:
+            _active.discard(self)
+        _release_tracemalloc()
+        _profiling_lock.release()
+
+    def finish(self, aborted=False):
+        """
+        Write the profile. aborted=True is used for reruns that never reached
+        finish(); the stage that was cut short is dropped instead of timed.
+        """
+        if self._released:
+            return None
+        aborted_in = self._current[0] if aborted and self._current else None
+        try:
+            if aborted:
+                self._current = None
+            self.stage(None)
+            self._profiler.disable()
+            total = time.perf_counter() - self._t0
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            self._release()
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._profiler.dump_stats(os.path.join(self.out_dir, "rerun.prof"))
+
+        with open(os.path.join(self.out_dir, "stages.folded"), "w") as f:
+            for s in self.stages:
+                f.write(f"rerun;{s['stage']} {max(1, round(s['seconds'] * 1000))}\n")
+
+        with open(os.path.join(self.out_dir, "stages.json"), "w") as f:
+            json.dump({"total_seconds": total, "aborted_in": aborted_in, "stages": self.stages}, f, indent=2)
+
+        with open(os.path.join(self.out_dir, "allocations.txt"), "w") as f:
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+            f.write("\n# top functions by cumulative time\n")
+            buf = io.StringIO()
+            pstats.Stats(self._profiler, stream=buf).sort_stats("cumulative").print_stats(25)
+            f.write(buf.getvalue())
+
+        status = f"aborted in {aborted_in}, " if aborted else ""
+        print(f"⏱️ Rerun profile ({status}{total:.2f}s) saved → {self.out_dir}")
+        for s in sorted(self.stages, key=lambda s: -s["seconds"])[:5]:
+            print(f"   • {s['stage']}: {s['seconds'] * 1000:.0f} ms, peak {s['peak_mb']:.1f} MB")
+        return self.out_dir
+
+
+def _finish_abandoned():
+    """
+    A rerun that raises (including Streamlit's RerunException/StopException
+    when a widget changes mid-run) never reaches prof.finish(). Its profile is
+    finished here, at the start of the next rerun, once its thread is gone or
+    is the thread starting this rerun, so the profiler and tracemalloc are
+    never left running.
+    """
+    current = threading.current_thread()
+    with _active_lock:
+        abandoned = [p for p in _active if p._thread is current or not p._thread.is_alive()]
+    for profile in abandoned:
+        try:
+            profile.finish(aborted=True)
+        except Exception as e:
+            print(f"⚠️ Could not write aborted rerun profile {profile.out_dir}: {e}")
+
+
+class _NoProfile:
+    def stage(self, name):
+        pass
+
+    def finish(self):
+        return None
+
+
+def start_rerun_profile(enabled):
+    """
+    A RerunProfile when enabled, otherwise a no-op with the same interface.
+    Also a no-op while another session's rerun is being profiled.
+    """
+    _finish_abandoned()
+    if not enabled:
+        return _NoProfile()
+    try:
+        return RerunProfile()
+    except (RuntimeError, ValueError) as e:
+        print(f"⏱️ Not profiling this rerun: {e}")
+        return _NoProfile()
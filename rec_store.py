@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from recommenders import Recommendation
+
+# ======================
+# 🗄️ Precomputed Recommendation Store
+# ======================
+STORE_PATH = os.path.join("data", "recommendations.db")
+
+# entries older than this are treated as stale (nightly job + some slack)
+MAX_AGE_SECONDS = 26 * 60 * 60
+
+# mode keys written by the batch job and looked up by the app
+MODES = ("content", "smart_mix")
+
+
+class RecommendationStore:
+    """
+    SQLite-backed store of per-user top-N lists, one row per (user, mode, seed).
+    seed is the seed track id, or "" for modes that don't take a seed track.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS recommendations (
+                user_id TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                seed TEXT NOT NULL DEFAULT '',
+                generated_at REAL NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (user_id, mode, seed)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def put_many(self, entries, generated_at=None):
+        """
+        entries: iterable of (user_id, mode, seed, [Recommendation, ...]).
+        Everything is written in a single transaction. Empty lists are not
+        stored, so the app falls back to computing them live.
+        """
+        generated_at = generated_at or time.time()
+        rows = [
+            (user_id, mode, seed or "", generated_at, json.dumps([r.to_row() for r in recs]))
+            for user_id, mode, seed, recs in entries
+            if recs
+        ]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO recommendations VALUES (?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def put(self, user_id, mode, recs, seed=""):
+        return self.put_many([(user_id, mode, seed, recs)])
+
+    def get(self, user_id, mode, seed="", max_age=MAX_AGE_SECONDS):
+        """
+        Fresh list of Recommendation records, or None if missing/stale/empty.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT generated_at, payload FROM recommendations WHERE user_id=? AND mode=? AND seed=?",
+                (user_id, mode, seed or ""),
+            ).fetchone()
+        if row is None or time.time() - row[0] > max_age:
+            return None
+        return [Recommendation(**r) for r in json.loads(row[1])] or None
+
+    def close(self):
+        self.conn.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=STORE_PATH):
+    """One RecommendationStore (and SQLite connection) per process, shared across reruns."""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = RecommendationStore(path)
+        return _stores[path]
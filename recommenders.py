@@ -0,0 +1,302 @@
+import sys
+import warnings
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from similarity import feature_matrix
+
+# share of the content score taken from numeric features when a feature store is given
+FEATURE_WEIGHT = 0.5
+
+# ======================
+# 📦 Recommendation Record
+# ======================
+class Recommendation:
+    """
+    One recommended track. Uses __slots__ (no per-instance dict) and interned
+    ids so large candidate pools stay small; UI rows are built on demand.
+    source = which recommender produced it, score = that recommender's score.
+    """
+    __slots__ = ("id", "name", "artist", "url", "preview", "image", "source", "score")
+
+    def __init__(self, id, name, artist, url=None, preview=None, image=None, source=None, score=None):
+        self.id = sys.intern(id) if isinstance(id, str) else id
+        self.name = name
+        self.artist = artist
+        self.url = url
+        self.preview = preview
+        self.image = image
+        self.source = sys.intern(source) if isinstance(source, str) else source
+        self.score = score
+
+    @classmethod
+    def from_track(cls, t, source, score=None):
+        """Build from a Spotify track object."""
+        return cls(
+            id=t["id"],
+            name=t["name"],
+            artist=", ".join([a["name"] for a in t["artists"]]),
+            url=t["external_urls"]["spotify"],
+            preview=t.get("preview_url"),
+            image=t["album"]["images"][0]["url"] if t["album"]["images"] else None,
+            source=source,
+            score=score,
+        )
+
+    def to_row(self):
+        """Dict with the keys the UI expects."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "artist": self.artist,
+            "url": self.url,
+            "preview": self.preview,
+            "image": self.image,
+            "source": self.source,
+            "score": self.score,
+        }
+
+    def __repr__(self):
+        return f"Recommendation({self.id!r}, {self.name!r}, source={self.source!r}, score={self.score!r})"
+
+
+def from_catalog(catalog, scored, source):
+    """Recommendation records for [(track_id, score), ...] using catalog metadata."""
+    rows = catalog.tracks_by_ids(track_id for track_id, _ in scored)
+    recs = []
+    for track_id, score in scored:
+        row = rows.get(track_id)
+        if row is None:
+            continue
+        recs.append(Recommendation(
+            id=track_id,
+            name=row["name"],
+            artist=row["artist_names"],
+            url=row["url"],
+            preview=row["preview_url"],
+            image=row["image"],
+            source=source,
+            score=score,
+        ))
+    return recs
+
+
+def dedupe(recs, limit=None):
+    """Keep the first occurrence of each track id (no copying of records)."""
+    seen = set()
+    unique_recs = []
+    for r in recs:
+        if r.id not in seen:
+            seen.add(r.id)
+            unique_recs.append(r)
+            if limit is not None and len(unique_recs) >= limit:
+                break
+    return unique_recs
+
+
+# ======================
+# 👩‍🎤 Recommend by Similar Artists
+# ======================
+def recommend_by_artists(sp, artist_df, limit=10):
+    """
+    Recommend tracks based on related artists.
+    Returns a list of Recommendation records.
+    """
+    recs = []
+    for artist_id in artist_df["id"].dropna().unique()[:5]:
+        try:
+            related = sp.artist_related_artists(artist_id)
+            for ra in related["artists"][:2]:
+                top_tracks = sp.artist_top_tracks(ra["id"])
+                for t in top_tracks["tracks"][:2]:
+                    recs.append(Recommendation.from_track(t, source="artists"))
+                    if len(recs) >= limit:
+                        return recs
+        except Exception as e:
+            print(f"⚠️ Failed artist rec for {artist_id}: {e}")
+    return recs[:limit]
+
+
+# ======================
+# 🎵 Spotify Recommendations API
+# ======================
+def recommend_spotify(sp, track_df, artist_df, limit=10):
+    """
+    Recommend tracks using Spotify's recommendations API.
+    Returns a list of Recommendation records.
+    """
+    seed_artists = artist_df["id"].dropna().tolist()[:2]
+    seed_tracks = track_df["id"].dropna().tolist()[:2]
+
+    try:
+        recs = sp.recommendations(
+            seed_artists=seed_artists,
+            seed_tracks=seed_tracks,
+            limit=limit
+        )
+        return [Recommendation.from_track(t, source="spotify") for t in recs["tracks"]]
+    except Exception as e:
+        print(f"⚠️ Spotify recs failed: {e}")
+        return []
+
+
+# ======================
+# 🎯 Content-Based Recommender
+# ======================
+def _feature_similarity(features, track_ids, seed_track_id):
+    """
+    Cosine similarity of each track to the seed on the feature store's numeric
+    features (one lookup for all ids); NaN where a track isn't in the store.
+    """
+    track_ids = [str(t) for t in track_ids]
+    sims = np.full(len(track_ids), np.nan, dtype=np.float32)
+    found, block = features.lookup(list(dict.fromkeys(track_ids + [str(seed_track_id)])))
+    if str(seed_track_id) not in found or len(found) < 2:
+        return sims
+    with warnings.catch_warnings():
+        # columns with no values at all (e.g. no Kaggle data) are expected
+        warnings.simplefilter("ignore", RuntimeWarning)
+        matrix = feature_matrix(block)
+    row_of = {t: i for i, t in enumerate(found)}
+    scores = matrix @ matrix[row_of[str(seed_track_id)]]
+    for i, t in enumerate(track_ids):
+        if t in row_of:
+            sims[i] = scores[row_of[t]]
+    return sims
+
+
+def recommend_content_based(final_df, seed_track_id, limit=10, neighbours=None, catalog=None, features=None):
+    """
+    Recommend songs similar to a seed track (by id) using cosine similarity on text features.
+    With a precomputed neighbour table (similarity.py) and the catalog, this is
+    a single row read; otherwise TF-IDF is fitted on final_df. Seeds that are
+    not in final_df (e.g. picked from the catalog search) are resolved
+    through the catalog. With a FeatureStore, the text score is blended with
+    similarity on numeric features (popularity, year, genres, audio).
+    Returns a list of Recommendation records scored by cosine similarity.
+    """
+    if neighbours is not None and catalog is not None and seed_track_id in neighbours:
+        return from_catalog(catalog, neighbours.neighbours(seed_track_id, limit=limit), source="content")
+
+    if "name" not in final_df.columns or "artist_name" not in final_df.columns:
+        return []
+
+    # Combine track name + artist name as text
+    final_df["combined"] = final_df["name"].fillna("") + " " + final_df["artist_name"].fillna("")
+    texts = final_df["combined"].tolist()
+
+    # Find the seed track's row; unknown seeds are appended from the catalog
+    is_seed = (final_df["id"] == seed_track_id).to_numpy()
+    if is_seed.any():
+        seed_row = int(is_seed.argmax())
+    else:
+        track = catalog.tracks_by_ids([seed_track_id]).get(seed_track_id) if catalog is not None else None
+        if track is None:
+            return []
+        texts.append(f"{track['name'] or ''} {track['artist_names'] or ''}")
+        seed_row = len(texts) - 1
+
+    # Vectorize
+    vectorizer = TfidfVectorizer(stop_words="english")
+    tfidf_matrix = vectorizer.fit_transform(texts)
+
+    cosine_sim = cosine_similarity(tfidf_matrix[seed_row], tfidf_matrix[:len(final_df)]).flatten()
+    if features is not None:
+        feature_sim = _feature_similarity(features, final_df["id"], seed_track_id)
+        cosine_sim = np.where(
+            np.isnan(feature_sim), cosine_sim, (1 - FEATURE_WEIGHT) * cosine_sim + FEATURE_WEIGHT * feature_sim
+        )
+    cosine_sim[is_seed] = -1.0  # exclude the seed itself
+    sim_indices = cosine_sim.argsort()[::-1][:min(limit, int((~is_seed).sum()))]
+
+    recs = []
+    for i in sim_indices:
+        row = final_df.iloc[i]
+        recs.append(Recommendation(
+            id=row.get("id"),
+            name=row.get("name"),
+            artist=row.get("artist_name"),
+            url=row["external_urls"]["spotify"] if isinstance(row.get("external_urls"), dict) else None,
+            preview=row.get("preview_url"),
+            image=row["album"]["images"][0]["url"] if isinstance(row.get("album"), dict) and row["album"].get("images") else None,
+            source="content",
+            score=float(cosine_sim[i]),
+        ))
+
+    return recs
+
+
+# ======================
+# 🏷️ Genre-Based Recommender
+# ======================
+def recommend_by_genre(genre_index, catalog, top_artists, liked_songs, followed_artists, limit=10,
+                       top_artists_by_range=None, user_id=None, playlist_ids=()):
+    """
+    Recommend catalog tracks whose genres best match the user's weighted
+    genre vector (top, liked and followed artists), skipping known tracks.
+    top_artists_by_range ({time_range: [artist, ...]}) uses every horizon
+    instead of the single top_artists response. With user_id, everything
+    the catalog knows the user has (all likes, top tracks of every range,
+    tracks of playlist_ids) is skipped too, not just the liked_songs page.
+    Returns a list of Recommendation records scored by genre similarity.
+    """
+    liked_tracks = [item["track"] for item in liked_songs["items"] if item.get("track")]
+    taste = genre_index.taste_vector(
+        top_artist_ids=[a["id"] for a in top_artists["items"]],
+        liked_artist_ids=[a["id"] for t in liked_tracks for a in t["artists"]],
+        followed_artist_ids=[a["id"] for a in followed_artists],
+        top_artists_by_range=None if top_artists_by_range is None else {
+            time_range: [a["id"] for a in artists] for time_range, artists in top_artists_by_range.items()
+        },
+    )
+    exclude = {t["id"] for t in liked_tracks}
+    if user_id is not None:
+        exclude |= catalog.known_track_ids(user_id, playlist_ids)
+    scored = genre_index.recommend(taste, exclude_track_ids=exclude, limit=limit)
+    return from_catalog(catalog, scored, source="genre")
+
+
+# ======================
+# 🤝 Collaborative Filtering Recommender
+# ======================
+def recommend_collaborative(cf, catalog, seed_track_ids, limit=10, exclude_track_ids=()):
+    """
+    Recommend tracks that co-occur with the seeds in the user's playlists.
+    Returns a list of Recommendation records scored by summed item-item similarity.
+    """
+    scored = cf.recommend(seed_track_ids, limit=limit, exclude_track_ids=exclude_track_ids)
+    return from_catalog(catalog, scored, source="collaborative")
+
+
+# ======================
+# 🌀 Smart Mix Recommender
+# ======================
+def smart_mix(sp, final_df, track_df, artist_df, seed_track_id=None, limit=10, cf=None, catalog=None,
+              neighbours=None, features=None):
+    """
+    Hybrid recommender: combine content-based + Spotify API + similar artists
+    (+ playlist collaborative filtering when cf and catalog are given).
+    Returns a list of Recommendation records, each tagged with its source.
+    """
+    recs = []
+    use_cf = cf is not None and catalog is not None
+    share = limit // (4 if use_cf else 3)
+
+    # Content-based part
+    if seed_track_id:
+        recs.extend(recommend_content_based(final_df, seed_track_id, limit=share,
+                                            neighbours=neighbours, catalog=catalog, features=features))
+
+    # Spotify picks
+    recs.extend(recommend_spotify(sp, track_df, artist_df, limit=share))
+
+    # Similar artists
+    recs.extend(recommend_by_artists(sp, artist_df, limit=share))
+
+    # Playlist co-occurrence, seeded by the user's top tracks
+    if use_cf:
+        seed_ids = track_df["id"].dropna().tolist()
+        recs.extend(recommend_collaborative(cf, catalog, seed_ids, limit=share, exclude_track_ids=seed_ids))
+
+    # Deduplicate by track id
+    return dedupe(recs, limit=limit)
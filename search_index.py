@@ -0,0 +1,147 @@
+import re
+import unicodedata
+import numpy as np
+from catalog import CatalogIndexCache
+
+# ======================
+# 🔎 Type-Ahead Track Search
+# ======================
+# once the candidate set is this small, stop intersecting and verify directly
+VERIFY_THRESHOLD = 256
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse punctuation to single spaces."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.sub(r"[^0-9a-z]+", " ", text).strip()
+
+
+def _trigrams(text, pad_end=True):
+    # queries are not padded at the end: the last word may still be partial
+    padded = f" {text} " if pad_end else f" {text}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrackSearchIndex:
+    """
+    Trigram index over "track name + artist names". Each trigram maps to a
+    sorted int32 posting list of row numbers; a query intersects the posting
+    lists of its trigrams (rarest first) and returns track ids, so tracks that
+    share a name stay distinct.
+    """
+
+    def __init__(self, track_ids, names, artists, popularity=None):
+        self.track_ids = list(track_ids)
+        self.row_of = {t: i for i, t in enumerate(self.track_ids)}
+        self.names = list(names)
+        self.artists = list(artists)
+        self.texts = [normalize(f"{n} {a}") for n, a in zip(self.names, self.artists)]
+        self.name_texts = [normalize(n) for n in self.names]
+        self.popularity = (
+            np.zeros(len(self.track_ids), dtype=np.float32) if popularity is None
+            else np.nan_to_num(np.asarray(popularity, dtype=np.float32))
+        )
+
+        postings = {}
+        for row, text in enumerate(self.texts):
+            for gram in _trigrams(text):
+                postings.setdefault(gram, []).append(row)
+        # rows were appended in increasing order, so every list is already sorted
+        self.postings = {g: np.asarray(rows, dtype=np.int32) for g, rows in postings.items()}
+
+        # sorted name prefixes for 1-2 character queries
+        order = np.argsort(np.asarray(self.name_texts, dtype=object), kind="stable")
+        self.prefix_rows = order.astype(np.int32)
+        self.prefix_keys = np.asarray([self.name_texts[i] for i in order], dtype=object)
+
+    @classmethod
+    def from_connection(cls, conn):
+        rows = conn.execute(
+            """
+            SELECT t.id, t.name, (
+                SELECT group_concat(name, ', ') FROM (
+                    SELECT a.name FROM track_artists ta JOIN artists a ON a.id = ta.artist_id
+                    WHERE ta.track_id = t.id ORDER BY ta.position
+                )
+            ), t.popularity
+            FROM tracks t
+            """
+        ).fetchall()
+        if not rows:
+            return cls([], [], [])
+        ids, names, artists, popularity = zip(*rows)
+        return cls(ids, names, artists, [p if p is not None else 0 for p in popularity])
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        conn = catalog.reader()
+        try:
+            return cls.from_connection(conn)
+        finally:
+            conn.close()
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def _prefix(self, query):
+        lo = np.searchsorted(self.prefix_keys, query, side="left")
+        hi = np.searchsorted(self.prefix_keys, query + "\uffff", side="left")
+        return self.prefix_rows[lo:hi]
+
+    def search(self, query, limit=20):
+        """
+        Track ids matching query, best first: name-prefix matches before
+        other matches, then by popularity.
+        """
+        q = normalize(query)
+        if not q or not self.track_ids:
+            return []
+
+        if len(q) < 3:
+            rows = self._prefix(q)
+        else:
+            lists = []
+            for gram in _trigrams(q, pad_end=False):
+                posting = self.postings.get(gram)
+                if posting is None:
+                    return []
+                lists.append(posting)
+            lists.sort(key=len)
+            rows = lists[0]
+            for posting in lists[1:]:
+                if len(rows) <= VERIFY_THRESHOLD:
+                    break
+                rows = np.intersect1d(rows, posting, assume_unique=True)
+            # very common queries: only verify the most popular candidates
+            cap = max(limit * 50, VERIFY_THRESHOLD)
+            if len(rows) > cap:
+                rows = rows[np.argpartition(-self.popularity[rows], cap - 1)[:cap]]
+            # trigrams can match out of order, so confirm the (word-start) substring
+            needle = " " + q
+            rows = np.fromiter((r for r in rows if needle in " " + self.texts[r]), dtype=np.int32)
+
+        if not len(rows):
+            return []
+        starts = np.fromiter((self.name_texts[r].startswith(q) for r in rows), dtype=bool, count=len(rows))
+        order = np.lexsort((-self.popularity[rows], ~starts))[:limit]
+        return [self.track_ids[r] for r in rows[order]]
+
+    def label(self, track_id):
+        """Display label for a track id ("name — artists")."""
+        row = self.row_of.get(track_id)
+        if row is None:
+            return str(track_id)
+        return f"{self.names[row]} — {self.artists[row]}"
+
+
+_cache = CatalogIndexCache(TrackSearchIndex.from_connection, name="search index")
+
+
+def get_index(catalog):
+    """
+    Index for the catalog, kept at module level across Streamlit reruns.
+    When the catalog changes it is rebuilt on a background thread and the
+    previous index is served meanwhile, so reruns never wait for a rebuild.
+    """
+    return _cache.get(catalog)
@@ -0,0 +1,210 @@
+import os
+import json
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+
+# ======================
+# 🌐 Shared Read-Only Catalog
+# ======================
+# Usage: python shared_catalog.py   (builds from the Kaggle dataset)
+#
+# The global catalog (track metadata, audio feature matrix, neighbour table)
+# is written once as .npy files and opened with mmap_mode="r". Every Streamlit
+# session in a process shares one SharedCatalog object, and every process on
+# the host shares the same page-cache pages, so a 30-session host holds one
+# copy. Only small per-user data (final_df, recs) lives per session.
+SHARED_DIR = os.path.join("data", "shared_catalog")
+STRING_COLUMNS = ["track_name", "artists", "album_name"]
+
+
+class IdIndex:
+    """
+    Track id -> row via binary search over a sorted, memory-mapped id array,
+    so no per-process dict of millions of ids is needed.
+    """
+
+    def __init__(self, sorted_ids, sorted_rows):
+        self.sorted_ids = sorted_ids
+        self.sorted_rows = sorted_rows
+
+    @staticmethod
+    def write(out_dir, ids):
+        ids = np.asarray(ids, dtype=str)
+        order = np.argsort(ids, kind="stable")
+        # temp file + rename: never truncate a file another process has mapped
+        for name, arr in (("sorted_ids.npy", ids[order]), ("sorted_rows.npy", order.astype(np.int32))):
+            tmp = os.path.join(out_dir, f"{name}.tmp-{os.getpid()}")
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, os.path.join(out_dir, name))
+
+    @classmethod
+    def open(cls, out_dir):
+        return cls(
+            np.load(os.path.join(out_dir, "sorted_ids.npy"), mmap_mode="r"),
+            np.load(os.path.join(out_dir, "sorted_rows.npy"), mmap_mode="r"),
+        )
+
+    @staticmethod
+    def exists(out_dir):
+        return os.path.exists(os.path.join(out_dir, "sorted_ids.npy"))
+
+    def rows(self, track_ids):
+        """(rows, found_mask) for the given ids, vectorised."""
+        query = np.asarray(list(track_ids), dtype=str)
+        if not len(query) or not len(self.sorted_ids):
+            return np.empty(0, np.int32), np.zeros(len(query), dtype=bool)
+        pos = np.searchsorted(self.sorted_ids, query)
+        pos = np.minimum(pos, len(self.sorted_ids) - 1)
+        found = self.sorted_ids[pos] == query
+        return np.asarray(self.sorted_rows[pos[found]]), found
+
+    def row(self, track_id):
+        rows, found = self.rows([track_id])
+        return int(rows[0]) if found[0] else None
+
+
+class _StringColumn:
+    """UTF-8 blob + int64 offsets; both memory-mapped."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @staticmethod
+    def write(out_dir, name, values):
+        encoded = [str(v).encode("utf-8") if isinstance(v, str) else b"" for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        np.save(os.path.join(out_dir, f"{name}.offsets.npy"), offsets)
+        np.save(os.path.join(out_dir, f"{name}.blob.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    @classmethod
+    def open(cls, out_dir, name):
+        return cls(
+            np.load(os.path.join(out_dir, f"{name}.blob.npy"), mmap_mode="r"),
+            np.load(os.path.join(out_dir, f"{name}.offsets.npy"), mmap_mode="r"),
+        )
+
+    def __getitem__(self, row):
+        return bytes(self.blob[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+
+def build_shared_catalog(kaggle_df, out_dir=SHARED_DIR):
+    """
+    Write the Kaggle tracks as memory-mappable arrays. The new files are
+    built in a side directory and swapped in, so open mmaps keep working.
+    """
+    from kaggle_loader import FLOAT_COLUMNS
+
+    df = kaggle_df.drop_duplicates(subset="track_id").reset_index(drop=True)
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    ids = df["track_id"].astype(str).to_numpy()
+    np.save(os.path.join(tmp_dir, "ids.npy"), np.asarray(ids, dtype=str))
+    IdIndex.write(tmp_dir, ids)
+
+    for col in STRING_COLUMNS:
+        _StringColumn.write(tmp_dir, col, df[col].tolist() if col in df.columns else [None] * len(df))
+
+    np.save(os.path.join(tmp_dir, "popularity.npy"),
+            pd.to_numeric(df.get("popularity", pd.Series(0, index=df.index)), errors="coerce").fillna(0).astype(np.int8).to_numpy())
+
+    genres = df["track_genre"].astype("category") if "track_genre" in df.columns else pd.Series(pd.Categorical([None] * len(df)))
+    np.save(os.path.join(tmp_dir, "genre_codes.npy"), genres.cat.codes.astype(np.int16).to_numpy())
+
+    feature_columns = [c for c in FLOAT_COLUMNS + ["key", "mode"] if c in df.columns]
+    features = np.column_stack([
+        pd.to_numeric(df[c].astype(object), errors="coerce").to_numpy(dtype=np.float32) for c in feature_columns
+    ]) if feature_columns else np.empty((len(df), 0), np.float32)
+    np.save(os.path.join(tmp_dir, "features.npy"), np.ascontiguousarray(features, dtype=np.float32))
+
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({"feature_columns": feature_columns, "genres": [str(g) for g in genres.cat.categories]}, f)
+
+    old_dir = f"{out_dir}.old-{os.getpid()}"
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    print(f"🌐 Shared catalog saved → {out_dir} ({len(df)} tracks, {len(feature_columns)} features)")
+    return SharedCatalog(out_dir)
+
+
+class SharedCatalog:
+    """Read-only, memory-mapped view of the global catalog."""
+
+    def __init__(self, out_dir=SHARED_DIR):
+        self.out_dir = out_dir
+        load = lambda name: np.load(os.path.join(out_dir, name), mmap_mode="r")
+        self.ids = load("ids.npy")
+        self.index = IdIndex.open(out_dir)
+        self.popularity = load("popularity.npy")
+        self.genre_codes = load("genre_codes.npy")
+        self.features = load("features.npy")
+        self.strings = {c: _StringColumn.open(out_dir, c) for c in STRING_COLUMNS}
+        with open(os.path.join(out_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.feature_columns = meta["feature_columns"]
+        self.genres = meta["genres"]
+
+    @staticmethod
+    def exists(out_dir=SHARED_DIR):
+        return os.path.exists(os.path.join(out_dir, "meta.json"))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def track(self, track_id):
+        """Metadata dict for one track, or None."""
+        row = self.index.row(track_id)
+        if row is None:
+            return None
+        code = int(self.genre_codes[row])
+        return {
+            "id": track_id,
+            "name": self.strings["track_name"][row],
+            "artist": self.strings["artists"][row],
+            "album": self.strings["album_name"][row],
+            "popularity": int(self.popularity[row]),
+            "genre": self.genres[code] if code >= 0 else None,
+        }
+
+    def audio_frame(self, track_ids):
+        """Audio features for the given ids (one fancy-index read), as a small DataFrame."""
+        rows, found = self.index.rows(track_ids)
+        ids = np.asarray(list(track_ids), dtype=str)[found]
+        frame = pd.DataFrame(np.asarray(self.features[rows]), columns=self.feature_columns)
+        frame.insert(0, "track_id", ids)
+        return frame
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_catalog(out_dir=SHARED_DIR):
+    """
+    One SharedCatalog per process (module state survives Streamlit reruns and
+    is shared by all sessions); reopened when the catalog is rebuilt.
+    Returns None if the catalog hasn't been built yet.
+    """
+    global _shared
+    meta = os.path.join(out_dir, "meta.json")
+    if not os.path.exists(meta):
+        return None
+    version = os.stat(meta).st_mtime_ns
+    with _shared_lock:
+        if _shared is None or _shared[0] != version:
+            _shared = (version, SharedCatalog(out_dir))
+        return _shared[1]
+
+
+if __name__ == "__main__":
+    from kaggle_loader import load_kaggle_tracks
+    build_shared_catalog(load_kaggle_tracks())
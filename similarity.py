@@ -0,0 +1,219 @@
+import os
+import shutil
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from shared_catalog import IdIndex
+
+# ======================
+# 🧭 Offline All-Pairs Top-K Similarity
+# ======================
+# Usage: python similarity.py --source catalog --top-k 50 --workers 4
+#        python similarity.py --source features --store data/feature_store/<user_id>
+#
+# Rows are scored block by block against the whole catalog in a process pool;
+# each block keeps only its top k neighbours, so the N x N matrix never exists.
+NEIGHBOURS_DIR = os.path.join("data", "neighbours")
+TOP_K = 50
+# upper bound on one dense score block (rows x catalog x float32)
+BLOCK_BYTES = 256 * 1024 * 1024
+
+_matrix = None  # catalog matrix, loaded once per worker process
+
+
+def _load_matrix(path):
+    global _matrix
+    if path.endswith(".npz"):
+        _matrix = sparse.load_npz(path).tocsr()
+    else:
+        _matrix = np.load(path, mmap_mode="r")
+
+
+def _score_block(start, stop, k):
+    """Top-k neighbours (excluding self) for rows [start, stop)."""
+    block = _matrix[start:stop]
+    scores = block @ _matrix.T
+    scores = scores.toarray() if sparse.issparse(scores) else np.asarray(scores)
+    scores = scores.astype(np.float32, copy=False)
+    scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+    k = min(k, scores.shape[1] - 1)
+    if k <= 0:
+        return start, np.empty((stop - start, 0), np.int32), np.empty((stop - start, 0), np.float16)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return (
+        start,
+        np.take_along_axis(top, order, axis=1).astype(np.int32),
+        np.take_along_axis(top_scores, order, axis=1).astype(np.float16),
+    )
+
+
+def tfidf_matrix(texts):
+    """Row-normalised TF-IDF of "track name + artists", as the content recommender uses."""
+    vectorizer = TfidfVectorizer(stop_words="english")
+    return vectorizer.fit_transform(texts).astype(np.float32)
+
+
+def feature_matrix(matrix):
+    """Z-scored, row-normalised copy of a feature store matrix (NaN -> column mean)."""
+    m = np.array(matrix, dtype=np.float32)
+    mean = np.nanmean(m, axis=0)
+    std = np.nanstd(m, axis=0)
+    mean = np.where(np.isnan(mean), 0, mean)
+    std = np.where(np.isnan(std) | (std == 0), 1, std)
+    m = np.where(np.isnan(m), mean, m)
+    return normalize((m - mean) / std).astype(np.float32)
+
+
+def build_neighbours(matrix, track_ids, out_dir=NEIGHBOURS_DIR, top_k=TOP_K, workers=None):
+    """
+    Compute and save the neighbour table for a row-normalised matrix
+    (sparse or dense; cosine == dot product). Returns a NeighbourTable.
+    The table is built in a side directory and swapped in, so sessions
+    that still map the old files keep reading a consistent snapshot.
+    """
+    n = matrix.shape[0]
+    k = max(0, min(top_k, n - 1))
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # workers read the catalog matrix from disk instead of receiving it per task
+    if sparse.issparse(matrix):
+        matrix_path = os.path.join(tmp_dir, "matrix.npz")
+        sparse.save_npz(matrix_path, sparse.csr_matrix(matrix, dtype=np.float32))
+    else:
+        matrix_path = os.path.join(tmp_dir, "matrix.npy")
+        np.save(matrix_path, np.ascontiguousarray(matrix, dtype=np.float32))
+
+    np.save(os.path.join(tmp_dir, "ids.npy"), np.asarray([str(t) for t in track_ids], dtype="U"))
+    indices = np.lib.format.open_memmap(os.path.join(tmp_dir, "indices.npy"), mode="w+", dtype=np.int32, shape=(n, k))
+    scores = np.lib.format.open_memmap(os.path.join(tmp_dir, "scores.npy"), mode="w+", dtype=np.float16, shape=(n, k))
+
+    block_rows = max(1, BLOCK_BYTES // (4 * max(n, 1)))
+    blocks = [(s, min(s + block_rows, n)) for s in range(0, n, block_rows)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_matrix, initargs=(matrix_path,)) as pool:
+        futures = [pool.submit(_score_block, s, e, k) for s, e in blocks]
+        for future in futures:
+            start, idx, sc = future.result()
+            indices[start:start + len(idx)] = idx
+            scores[start:start + len(sc)] = sc
+
+    indices.flush()
+    scores.flush()
+    del indices, scores
+    IdIndex.write(tmp_dir, [str(t) for t in track_ids])
+    os.remove(matrix_path)
+
+    old_dir = f"{out_dir}.old-{os.getpid()}"
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    print(f"🧭 Neighbour table saved → {out_dir} ({n} tracks × top {k})")
+    return NeighbourTable(out_dir)
+
+
+class NeighbourTable:
+    """
+    Precomputed top-k neighbours: int32 row ids + float16 scores, memory-mapped.
+    Ids resolve by binary search over a memory-mapped sorted id array, so
+    opening the table costs no per-process memory. A lookup is one row read.
+    """
+
+    def __init__(self, out_dir=NEIGHBOURS_DIR):
+        self.ids = np.load(os.path.join(out_dir, "ids.npy"), mmap_mode="r")
+        self.indices = np.load(os.path.join(out_dir, "indices.npy"), mmap_mode="r")
+        self.scores = np.load(os.path.join(out_dir, "scores.npy"), mmap_mode="r")
+        if not IdIndex.exists(out_dir):
+            # tables built before the id index existed: derive it from ids.npy once
+            IdIndex.write(out_dir, self.ids)
+        self.index = IdIndex.open(out_dir)
+
+    @staticmethod
+    def exists(out_dir=NEIGHBOURS_DIR):
+        return os.path.exists(os.path.join(out_dir, "indices.npy"))
+
+    def __contains__(self, track_id):
+        return self.index.row(track_id) is not None
+
+    def neighbours(self, track_id, limit=10):
+        """[(track_id, score), ...] best first, or [] for unknown tracks."""
+        row = self.index.row(track_id)
+        if row is None:
+            return []
+        idx = self.indices[row, :limit]
+        sc = self.scores[row, :limit]
+        return [(str(self.ids[i]), float(s)) for i, s in zip(idx, sc)]
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_neighbour_table(out_dir=NEIGHBOURS_DIR):
+    """
+    One NeighbourTable per process (shared across reruns and sessions);
+    reopened when the table is rebuilt. Returns None if it hasn't been built yet.
+    """
+    try:
+        stat = os.stat(os.path.join(out_dir, "indices.npy"))
+    except FileNotFoundError:
+        return None
+    # a rebuild swaps in a new directory, so the file identity changes
+    version = (stat.st_ino, stat.st_mtime_ns)
+    with _tables_lock:
+        cached = _tables.get(out_dir)
+        if cached is None or cached[0] != version:
+            cached = _tables[out_dir] = (version, NeighbourTable(out_dir))
+        return cached[1]
+
+
+def _catalog_texts(catalog):
+    rows = catalog.conn.execute(
+        """
+        SELECT t.id, coalesce(t.name, '') || ' ' || coalesce((
+            SELECT group_concat(name, ' ') FROM (
+                SELECT a.name FROM track_artists ta JOIN artists a ON a.id = ta.artist_id
+                WHERE ta.track_id = t.id ORDER BY ta.position
+            )
+        ), '')
+        FROM tracks t
+        """
+    ).fetchall()
+    return [r[0] for r in rows], [r[1] for r in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute top-k track neighbours.")
+    parser.add_argument("--source", choices=["catalog", "features"], default="catalog",
+                        help="catalog = TF-IDF on name + artists, features = feature store matrix")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=NEIGHBOURS_DIR)
+    parser.add_argument("--store", default=None,
+                        help="feature store directory for --source features, e.g. data/feature_store/<user_id>")
+    args = parser.parse_args()
+
+    if args.source == "catalog":
+        from catalog import Catalog
+        ids, texts = _catalog_texts(Catalog())
+        matrix = tfidf_matrix(texts)
+    else:
+        from feature_store import FeatureStore
+        # main.py keeps one store per user under data/feature_store/<user_id>
+        if not args.store:
+            parser.error("--source features needs --store <feature store directory>")
+        store = FeatureStore(args.store)
+        ids, matrix = store.ids.tolist(), feature_matrix(store.matrix)
+
+    build_neighbours(matrix, ids, out_dir=args.out, top_k=args.top_k, workers=args.workers)
@@ -0,0 +1,52 @@
+import json
+import threading
+from concurrent.futures import Future
+
+import spotipy
+
+# ======================
+# 🔁 Single-Flight Spotify Client
+# ======================
+class CoalescingSpotify(spotipy.Spotify):
+    """
+    spotipy.Spotify where identical GET requests share one call.
+    Concurrent callers wait on the in-flight request; later callers get the
+    finished response. main.py makes a new client per rerun, so responses are
+    reused for exactly one rerun. Shared responses must not be mutated.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+    def _get(self, url, args=None, payload=None, **kwargs):
+        if args:
+            kwargs.update(args)
+        key = (url, json.dumps(kwargs, sort_keys=True, default=str))
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            owner = flight is None
+            if owner:
+                flight = Future()
+                self._flights[key] = flight
+
+        if not owner:
+            return flight.result()
+
+        try:
+            result = super()._get(url, payload=payload, **kwargs)
+        except Exception as e:
+            # don't cache failures: the next caller retries
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.set_exception(e)
+            raise
+        flight.set_result(result)
+        return result
+
+    def clear(self):
+        """Forget finished responses (in-flight calls are unaffected)."""
+        with self._flights_lock:
+            self._flights = {k: f for k, f in self._flights.items() if not f.done()}
@@ -379,25 +379,30 @@ for playlist in playlists['items']:
                 artist_options[a['name']] = a['id']
 
 # Collect all available tracks from top tracks, liked songs, and playlists
-track_options = {track['name']: track['id'] for track in top_tracks['items']}
+# keyed on track id so tracks that share a name don't overwrite each other
+track_options = {track['id']: f"{track['name']} — {track['artists'][0]['name']}" for track in top_tracks['items']}
 
 for item in liked_songs['items']:
     track = item['track']
-    track_options[track['name']] = track['id']
+    track_options[track['id']] = f"{track['name']} — {track['artists'][0]['name']}"
 
 for playlist in playlists['items']:
     playlist_tracks = sp.playlist_tracks(playlist['id'], limit=20)
     for item in playlist_tracks['items']:
         track = item['track']
         if track:
-            track_options[track['name']] = track['id']
+            track_options[track['id']] = f"{track['name']} — {track['artists'][0]['name']}"
 
 manual_artist = st.selectbox("Pick a seed artist (optional)", ["None"] + sorted(artist_options.keys()))
-manual_track = st.selectbox("Pick a seed track (optional)", ["None"] + sorted(track_options.keys()))
+manual_track = st.selectbox(
+    "Pick a seed track (optional)",
+    ["None"] + sorted(track_options, key=track_options.get),
+    format_func=lambda x: track_options.get(x, x)
+)
 
 if st.button("Get Recommendations"):
     selected_artist_id = artist_options.get(manual_artist) if manual_artist != "None" else None
-    selected_track_id = track_options.get(manual_track) if manual_track != "None" else None
+    selected_track_id = manual_track if manual_track != "None" else None
 
     recs = recommend_spotify(sp, track_df, artist_df, limit=num_recs, manual_artist=selected_artist_id, manual_track=selected_track_id)
 
@@ -0,0 +1,88 @@
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+import audio_features
+from audio_features import AudioFeatureCache, LocalPreviewFetcher, LOCAL_AUDIO_FEATURES, analyse_previews
+
+SAMPLE_RATE = 22050
+
+
+def _write_clip(path, freq, seconds=2.0):
+    """A short mono tone with a click every half second (something to track a tempo on)."""
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    y = 0.4 * np.sin(2 * np.pi * freq * t)
+    y[(np.arange(len(t)) % (SAMPLE_RATE // 2)) < 200] += 0.5
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(y, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+@pytest.fixture
+def fixtures_dir(tmp_path):
+    # no MP3 encoder can be assumed here, so the fixtures are WAV clips;
+    # they go through the same librosa.load() decoding path
+    clips = tmp_path / "previews"
+    clips.mkdir()
+    _write_clip(clips / "low.wav", 220)
+    _write_clip(clips / "high.wav", 880)
+    return clips
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AudioFeatureCache(str(tmp_path / "audio_features.db"))
+
+
+TRACKS = [
+    ("t_low", "https://p.scdn.co/mp3-preview/low?cid=1"),
+    ("t_high", "https://p.scdn.co/mp3-preview/high?cid=1"),
+    ("t_missing", "https://p.scdn.co/mp3-preview/missing?cid=1"),
+]
+
+
+def _no_fetch(url):
+    raise AssertionError(f"unexpected download of {url}")
+
+
+def test_analyse_previews_from_local_fixtures(fixtures_dir, cache):
+    pytest.importorskip("librosa")
+
+    df = analyse_previews(TRACKS, cache=cache, fetch=LocalPreviewFetcher(str(fixtures_dir)), decode_workers=1)
+
+    assert list(df.columns) == ["id"] + LOCAL_AUDIO_FEATURES
+    assert set(df["id"]) == {"t_low", "t_high"}
+    features = df.set_index("id")
+    assert features[LOCAL_AUDIO_FEATURES].notna().all().all()
+    # the higher tone has the higher spectral centroid
+    assert features.loc["t_high", "audio_centroid"] > features.loc["t_low", "audio_centroid"]
+
+    # second run: analysed clips come from the cache, the failed one is not retried
+    again = analyse_previews(TRACKS, cache=cache, fetch=_no_fetch)
+    assert set(again["id"]) == {"t_low", "t_high"}
+
+
+def test_failed_downloads_are_cached(fixtures_dir, cache, monkeypatch):
+    monkeypatch.setattr(audio_features, "analysis_available", lambda: True)
+    missing = [TRACKS[2]]
+
+    df = analyse_previews(missing, cache=cache, fetch=LocalPreviewFetcher(str(fixtures_dir)))
+    assert df.empty
+    assert cache.recent_failures(["t_missing"]) == {"t_missing"}
+
+    analyse_previews(missing, cache=cache, fetch=_no_fetch)
+    # once the failure is old enough the track is tried again
+    assert cache.recent_failures(["t_missing"], max_age=0) == set()
+
+
+def test_nothing_is_downloaded_without_librosa(cache, monkeypatch):
+    monkeypatch.setattr(audio_features, "analysis_available", lambda: False)
+
+    df = analyse_previews(TRACKS, cache=cache, fetch=_no_fetch)
+    assert df.empty
+    assert list(df.columns) == ["id"] + LOCAL_AUDIO_FEATURES
@@ -0,0 +1,62 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from collab_filter import ItemItemCF
+
+
+def _playlists(n_playlists=12, n_tracks=30, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        f"p{i}": [f"t{j}" for j in rng.choice(n_tracks, size=rng.integers(3, 9), replace=False)]
+        for i in range(n_playlists)
+    }
+
+
+def _similarities(engine, track_ids):
+    return {t: dict(engine.similar(t, limit=len(engine.track_ids))) for t in track_ids}
+
+
+def _assert_same_as_fit(engine, playlists):
+    fresh = ItemItemCF().fit(playlists)
+    updated = _similarities(engine, engine.track_ids)
+    expected = _similarities(fresh, engine.track_ids)
+    assert updated.keys() == expected.keys()
+    for track_id, neighbours in expected.items():
+        assert updated[track_id].keys() == neighbours.keys(), track_id
+        for other, score in neighbours.items():
+            assert updated[track_id][other] == pytest.approx(score, abs=1e-6)
+
+
+@pytest.mark.parametrize("change", ["add", "drop", "edit"])
+def test_update_matches_a_fresh_fit(change):
+    playlists = _playlists()
+    engine = ItemItemCF().fit(playlists)
+
+    if change == "add":
+        changed = {"p_new": ["t1", "t2", "t99", "t5"]}
+    elif change == "drop":
+        changed = {"p3": None}
+    else:
+        changed = {"p0": playlists["p0"][1:] + ["t42"]}
+    engine.update(changed)
+
+    for pid, tracks in changed.items():
+        if tracks is None:
+            playlists.pop(pid)
+        else:
+            playlists[pid] = tracks
+    _assert_same_as_fit(engine, playlists)
+
+
+def test_successive_updates_match_a_fresh_fit():
+    playlists = _playlists(seed=1)
+    engine = ItemItemCF().fit({})
+    for pid, tracks in playlists.items():
+        engine.update({pid: tracks})
+    engine.update({"p2": None, "p7": None})
+    playlists.pop("p2")
+    playlists.pop("p7")
+
+    _assert_same_as_fit(engine, playlists)
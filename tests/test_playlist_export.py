@@ -0,0 +1,124 @@
+import pytest
+
+pytest.importorskip("spotipy")
+requests = pytest.importorskip("requests")
+
+from spotipy.exceptions import SpotifyException
+
+import playlist_export
+from playlist_export import ExportState, export_playlist
+
+
+class FakeSpotify:
+    """
+    In-memory Spotify. create_failures / add_failures map a call number to
+    (lands, error): whether the write is applied before error is raised.
+    """
+
+    def __init__(self, create_failures=None, add_failures=None):
+        self.playlists = {}
+        self.create_calls = 0
+        self.add_calls = []
+        self.create_failures = create_failures or {}
+        self.add_failures = add_failures or {}
+
+    def current_user_playlists(self, limit=50):
+        # newest first, like the real endpoint
+        newest = list(self.playlists.items())[::-1][:limit]
+        return {"items": [{"id": pid, "name": p["name"]} for pid, p in newest]}
+
+    def user_playlist_create(self, user_id, name, public=False, description=""):
+        lands, error = self.create_failures.get(self.create_calls, (True, None))
+        self.create_calls += 1
+        playlist_id = f"pl{len(self.playlists)}"
+        if lands:
+            self.playlists[playlist_id] = {"name": name, "tracks": []}
+        if error is not None:
+            raise error
+        return {"id": playlist_id}
+
+    def playlist_add_items(self, playlist_id, items):
+        lands, error = self.add_failures.get(len(self.add_calls), (True, None))
+        self.add_calls.append(list(items))
+        if lands:
+            self.playlists[playlist_id]["tracks"].extend(items)
+        if error is not None:
+            raise error
+
+    def playlist(self, playlist_id, fields=None):
+        return {"tracks": {"total": len(self.playlists[playlist_id]["tracks"])}}
+
+
+TRACK_IDS = [f"t{i:04d}" for i in range(1000)]
+URIS = [f"spotify:track:{t}" for t in TRACK_IDS]
+
+
+@pytest.fixture
+def state(tmp_path):
+    return ExportState(str(tmp_path / "exports.db"))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(playlist_export.time, "sleep", delays.append)
+    return delays
+
+
+def _export(sp, state):
+    return export_playlist(sp, "user", "Mix", TRACK_IDS, state=state)
+
+
+def test_thousand_tracks_take_ten_add_calls(state, sleeps):
+    sp = FakeSpotify()
+
+    playlist_id = _export(sp, state)
+
+    assert sp.create_calls == 1
+    assert [len(batch) for batch in sp.add_calls] == [100] * 10
+    assert sp.playlists[playlist_id]["tracks"] == URIS
+    assert sleeps == []
+
+
+@pytest.mark.parametrize("lands", [True, False])
+def test_failed_create_is_not_duplicated(state, sleeps, lands):
+    sp = FakeSpotify(create_failures={0: (lands, SpotifyException(503, -1, "Service unavailable"))})
+
+    playlist_id = _export(sp, state)
+
+    # a create that went through is found instead of being sent again
+    assert sp.create_calls == (1 if lands else 2)
+    assert list(sp.playlists) == [playlist_id]
+    assert sp.playlists[playlist_id]["tracks"] == URIS
+
+
+def test_add_that_lands_then_times_out_is_not_resent(state, sleeps):
+    sp = FakeSpotify(add_failures={3: (True, requests.exceptions.Timeout("read timed out"))})
+
+    playlist_id = _export(sp, state)
+
+    assert len(sp.add_calls) == 10
+    assert sp.playlists[playlist_id]["tracks"] == URIS
+
+
+def test_rate_limited_add_waits_for_retry_after(state, sleeps):
+    error = SpotifyException(429, -1, "Too many requests", headers={"Retry-After": "7"})
+    sp = FakeSpotify(add_failures={0: (False, error)})
+
+    playlist_id = _export(sp, state)
+
+    assert sleeps == [7.0]
+    assert len(sp.add_calls) == 11
+    assert sp.playlists[playlist_id]["tracks"] == URIS
+
+
+def test_rerun_after_a_failed_export_resumes_the_same_playlist(state, sleeps):
+    sp = FakeSpotify(add_failures={4: (False, SpotifyException(403, -1, "Forbidden"))})
+    with pytest.raises(SpotifyException):
+        _export(sp, state)
+
+    playlist_id = _export(sp, state)
+
+    assert sp.create_calls == 1
+    assert list(sp.playlists) == [playlist_id]
+    assert sp.playlists[playlist_id]["tracks"] == URIS